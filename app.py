@@ -1,32 +1,294 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session
-from werkzeug.utils import secure_filename
+from flask import Flask, render_template, request, redirect, url_for, flash, session, make_response, abort, send_from_directory
+from flask_compress import Compress
 import os
+import mimetypes
 from datetime import datetime
 import uuid
+import hashlib
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from contextlib import suppress
 
-from config import Config
-from database import get_db_connection
-from utils import allowed_file, send_welcome_email, generate_random_password, is_strong_password, hash_password, verify_password
-from auth import login_required, admin_required
+from config import Config, config
+from database import (get_read_connection, get_write_connection, enqueue_email, claim_due_emails, mark_email_sent, mark_email_failed, purge_dead_emails,
+                      mark_image_deleted, unmark_image_deleted, get_deleted_images, forget_deleted_images, ensure_schema)
+from utils import (allowed_file, get_file_extension, build_welcome_email, send_notification_email, close_smtp, generate_random_password, is_strong_password, hash_password, hash_password_async, verify_password, password_needs_rehash,
+                   update_storage_usage, invalidate_storage_usage)
+from auth import login_required, admin_required, invalidate_user_cache
 
 app = Flask(__name__)
-app.config.from_object(Config)
+# Without FLASK_ENV the plain (non-debug) Config is used, never DevelopmentConfig
+flask_env = os.environ.get('FLASK_ENV')
+app.config.from_object(config[flask_env] if flask_env else Config)
+Compress(app)
 
 # Ensure upload directory exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+def page_etag(*fingerprint):
+    """ETag for a public page, from a fingerprint of its data and the viewer.
+
+    Returns None while flash messages are pending: those render once, so
+    the page must not be answered from a client's cache.
+    """
+    if '_flashes' in session:
+        return None
+    viewer = (session.get('user_id'), session.get('username'), session.get('is_admin'))
+    key = ':'.join(str(part) for part in fingerprint + viewer)
+    return hashlib.md5(key.encode()).hexdigest()
+
+def etag_matches(etag):
+    """Check If-None-Match against a page ETag.
+
+    Flask-Compress tags compressed responses as "<etag>:gzip" and so on,
+    so clients send those back and they count as a match too.
+    """
+    if not etag:
+        return False
+    return any(tag == etag or tag.startswith(etag + ':') for tag in request.if_none_match.as_set())
+
+def not_modified(etag):
+    """Answer a conditional GET whose cached copy is still current"""
+    response = make_response('', 304)
+    response.set_etag(etag)
+    return response
+
+def etag_response(etag, body):
+    """Wrap a rendered page in a response tagged for conditional GETs"""
+    response = make_response(body)
+    if etag:
+        response.set_etag(etag)
+    return response
+
+@app.after_request
+def cache_uploaded_images(response):
+    """Let browsers and proxies keep uploaded images for good.
+
+    Uploads get a fresh UUID name whenever an image changes, so a URL
+    always points at the same bytes and never needs revalidating.
+    """
+    is_upload = request.endpoint == 'uploaded_image' or \
+        (request.endpoint == 'static' and request.view_args.get('filename', '').startswith('uploads/'))
+    if is_upload and response.status_code in (200, 304):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = int(app.config['UPLOAD_MAX_AGE'].total_seconds())
+        response.cache_control.immutable = True
+    return response
+
+@app.route('/image/<name>')
+def uploaded_image(name):
+    """Serve an uploaded image, handing the transfer to nginx when configured.
+
+    With UPLOAD_ACCEL_REDIRECT set, nginx needs a matching internal location:
+        location /protected/uploads/ { internal; alias /path/to/static/uploads/; }
+    """
+    if not allowed_file(name):
+        abort(404)
+    
+    accel_prefix = app.config['UPLOAD_ACCEL_REDIRECT']
+    if not accel_prefix:
+        return send_from_directory(app.config['UPLOAD_FOLDER'], name)
+    
+    # Empty body: nginx streams the file itself with sendfile()
+    response = make_response('')
+    response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + name
+    response.mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    return response
+
+# Upload writes run here so the request thread can get on with the DB work
+IO_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix='upload-io')
+
+def stage_upload(file):
+    """Start writing an uploaded image to a temporary .part file.
+
+    Returns the final filename and the pending write. Nothing appears under
+    the final name until commit_upload() moves it into place.
+    """
+    filename = str(uuid.uuid4()) + '.' + get_file_extension(file.filename)
+    part_path = os.path.join(app.config['UPLOAD_FOLDER'], filename + '.part')
+    return filename, IO_POOL.submit(file.save, part_path)
+
+def commit_upload(filename, pending):
+    """Wait for a staged upload and atomically move it into place"""
+    path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    try:
+        pending.result()
+        os.replace(path + '.part', path)
+        update_storage_usage(os.path.getsize(path))
+        return True
+    except OSError as e:
+        print(f"Failed to save upload {filename}: {e}")
+        discard_upload(filename, pending)
+        return False
+
+def discard_upload(filename, pending):
+    """Throw away a staged upload, e.g. after the DB write failed"""
+    with suppress(Exception):
+        pending.result()
+    with suppress(FileNotFoundError):
+        os.remove(os.path.join(app.config['UPLOAD_FOLDER'], filename + '.part'))
+
+# Wakes the email worker as soon as something lands in the outbox
+email_queue = queue.Queue()
+
+def queue_welcome_email(email, username, password, is_reset=False):
+    """Put a welcome / password reset email in the outbox for the email worker"""
+    if not app.config['MAIL_USERNAME'] or not app.config['MAIL_PASSWORD']:
+        raise Exception("Email configuration not set. Please configure MAIL_USERNAME and MAIL_PASSWORD.")
+    
+    subject, body = build_welcome_email(username, password, is_reset)
+    enqueue_email(email, subject, body)
+    email_queue.put(None)
+
+def process_email_outbox():
+    """Send every outbox email that is due and return how many were delivered"""
+    max_attempts = app.config['EMAIL_MAX_ATTEMPTS']
+    # Left over from before failed emails were dropped, or from a lower limit
+    for recipient in purge_dead_emails(max_attempts):
+        print(f"Gave up on email to {recipient}")
+    
+    sent = 0
+    while True:
+        emails = claim_due_emails(max_attempts=max_attempts)
+        if not emails:
+            return sent
+        
+        for email in emails:
+            # A failure here only affects this email; its lease expires and
+            # it is picked up again on a later pass
+            try:
+                send_notification_email(email['recipient'], email['subject'], email['body'])
+            except Exception as e:
+                print(f"Email to {email['recipient']} failed (attempt {email['attempts'] + 1}): {e}")
+                try:
+                    if mark_email_failed(email['id'], email['attempts'], e,
+                                         app.config['EMAIL_RETRY_BASE_SECONDS'], max_attempts):
+                        print(f"Gave up on email to {email['recipient']}")
+                except Exception as e:
+                    print(f"Failed to record email failure: {e}")
+            else:
+                try:
+                    mark_email_sent(email['id'])
+                    sent += 1
+                except Exception as e:
+                    print(f"Failed to remove sent email from the outbox: {e}")
+
+def email_worker():
+    """Deliver outbox emails in the background, off the request path"""
+    while True:
+        try:
+            email_queue.get(timeout=app.config['EMAIL_POLL_INTERVAL'])
+        except queue.Empty:
+            pass  # Periodic sweep picks up retries and mail queued before a restart
+        
+        try:
+            process_email_outbox()
+        except Exception as e:
+            print(f"Email worker error: {e}")
+        finally:
+            close_smtp()  # Reused across a batch, not held open while idle
+
+def start_email_worker():
+    """Start the background email worker thread"""
+    worker = threading.Thread(target=email_worker, name='email-worker', daemon=True)
+    worker.start()
+    return worker
+
+def sweep_deleted_images():
+    """Unlink images queued by edits and deletes and return how many were removed"""
+    removed = 0
+    while True:
+        rows = get_deleted_images(app.config['IMAGE_SWEEP_GRACE'])
+        if not rows:
+            return removed
+        
+        done = []
+        for row in rows:
+            try:
+                os.remove(os.path.join(app.config['UPLOAD_FOLDER'], row['path']))
+                removed += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Failed to remove image {row['path']}: {e}")
+                continue  # Left queued for the next pass
+            done.append(row['id'])
+        forget_deleted_images(done)
+        if done:
+            invalidate_storage_usage()
+        
+        if len(done) < len(rows):
+            return removed
+
+def image_sweeper():
+    """Remove replaced and deleted images in the background, off the request path"""
+    while True:
+        time.sleep(app.config['IMAGE_SWEEP_INTERVAL'])
+        try:
+            sweep_deleted_images()
+        except Exception as e:
+            print(f"Image sweeper error: {e}")
+
+def start_image_sweeper():
+    """Start the background image sweeper thread"""
+    sweeper = threading.Thread(target=image_sweeper, name='image-sweeper', daemon=True)
+    sweeper.start()
+    return sweeper
+
+def start_background_workers():
+    """Start the email worker and image sweeper for this process"""
+    # Databases created before the outbox and sweeper tables existed get
+    # them here, before either worker queries them
+    ensure_schema()
+    start_email_worker()
+    start_image_sweeper()
+
+# Importing the app starts nothing. The dev server below and gunicorn's
+# post_fork hook (one set per worker) are the only callers of
+# start_background_workers(), so flask shell, scripts and tests stay inert.
+
 @app.route('/')
 def index():
-    conn = get_db_connection()
-    articles = conn.execute('''
-        SELECT a.*, u.username 
-        FROM articles a 
-        JOIN users u ON a.author_id = u.id 
-        WHERE a.published = TRUE 
-        ORDER BY a.created_at DESC
-    ''').fetchall()
-    conn.close()
-    return render_template('index.html', articles=articles)
+    with get_read_connection() as conn:
+        # Cheap fingerprint first; repeat visitors stop here with a 304.
+        # Author names are shown too, and users have no updated_at, so a
+        # rename must change the fingerprint through the names themselves.
+        state = conn.execute('''
+            SELECT COUNT(*) AS count, IFNULL(MAX(a.updated_at), '') AS updated,
+                   (SELECT group_concat(id || '=' || username) FROM (
+                        SELECT DISTINCT u.id, u.username
+                        FROM articles a JOIN users u ON a.author_id = u.id
+                        WHERE a.published = TRUE ORDER BY u.id
+                   )) AS authors
+            FROM articles a JOIN users u ON a.author_id = u.id
+            WHERE a.published = TRUE
+        ''').fetchone()
+        etag = page_etag(state['count'], state['updated'], state['authors'])
+        if etag_matches(etag):
+            return not_modified(etag)
+        
+        articles = conn.execute('''
+            SELECT a.*, u.username 
+            FROM articles a 
+            JOIN users u ON a.author_id = u.id 
+            WHERE a.published = TRUE 
+            ORDER BY a.created_at DESC
+        ''').fetchall()
+    return etag_response(etag, render_template('index.html', articles=articles))
+
+def store_rehashed_password(user_id, old_hash, pending):
+    """Save an upgraded password hash once the hashing pool has produced it"""
+    try:
+        with get_write_connection() as conn:
+            # Only if the password hasn't been changed in the meantime
+            conn.execute('UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?',
+                         (pending.result(), user_id, old_hash))
+    except Exception as e:
+        print(f"Failed to upgrade password hash for user {user_id}: {e}")
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -34,13 +296,19 @@ def login():
         username = request.form['username']
         password = request.form['password']
         
-        conn = get_db_connection()
-        user = conn.execute(
-            'SELECT * FROM users WHERE username = ? AND active = TRUE', (username,)
-        ).fetchone()
-        conn.close()
+        with get_read_connection() as conn:
+            user = conn.execute(
+                'SELECT * FROM users WHERE username = ? AND active = TRUE', (username,)
+            ).fetchone()
         
-        if user and user['password_hash'] == password:  # Simple password check for now
+        if user and verify_password(user['password_hash'], password):
+            if password_needs_rehash(user['password_hash']):
+                # Upgrade plain-text or outdated hashes now that we know the
+                # password, in the background so the login doesn't wait on it
+                hash_password_async(password).add_done_callback(
+                    partial(store_rehashed_password, user['id'], user['password_hash'])
+                )
+            
             session['user_id'] = user['id']
             session['username'] = user['username']
             session['is_admin'] = user['is_admin']
@@ -60,37 +328,34 @@ def logout():
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    conn = get_db_connection()
-    if session.get('is_admin'):
-        articles = conn.execute('''
-            SELECT a.*, u.username 
-            FROM articles a 
-            JOIN users u ON a.author_id = u.id 
-            ORDER BY a.created_at DESC
-        ''').fetchall()
-    else:
+    # One statement text for admins and authors, so each pooled connection
+    # prepares it once and reuses it from sqlite3's statement cache
+    with get_read_connection() as conn:
         articles = conn.execute('''
             SELECT a.*, u.username 
             FROM articles a 
             JOIN users u ON a.author_id = u.id 
-            WHERE a.author_id = ? 
+            WHERE ? = 1 OR a.author_id = ? 
             ORDER BY a.created_at DESC
-        ''', (session['user_id'],)).fetchall()
-    conn.close()
+        ''', (int(bool(session.get('is_admin'))), session['user_id'])).fetchall()
     
     return render_template('dashboard.html', articles=articles)
 
 @app.route('/admin/users')
 @admin_required
 def admin_users():
-    conn = get_db_connection()
-    users = conn.execute('''
-        SELECT id, username, email, is_admin, active, created_at,
-               (SELECT COUNT(*) FROM articles WHERE author_id = users.id) as article_count
-        FROM users 
-        ORDER BY created_at DESC
-    ''').fetchall()
-    conn.close()
+    with get_read_connection() as conn:
+        users = conn.execute('''
+            SELECT u.id, u.username, u.email, u.is_admin, u.active, u.created_at,
+                   COALESCE(a.article_count, 0) as article_count
+            FROM users u
+            LEFT JOIN (
+                SELECT author_id, COUNT(*) as article_count
+                FROM articles
+                GROUP BY author_id
+            ) a ON a.author_id = u.id
+            ORDER BY u.created_at DESC
+        ''').fetchall()
     return render_template('admin_users.html', users=users)
 
 @app.route('/admin/add_user', methods=['GET', 'POST'])
@@ -108,34 +373,31 @@ def admin_add_user():
         # Generate random password
         password = generate_random_password()
         
-        conn = get_db_connection()
         try:
-            conn.execute(
-                'INSERT INTO users (username, email, password_hash, is_admin, active) VALUES (?, ?, ?, ?, ?)',
-                (username, email, password, is_admin, True)
-            )
-            conn.commit()
+            with get_write_connection() as conn:
+                conn.execute(
+                    'INSERT INTO users (username, email, password_hash, is_admin, active) VALUES (?, ?, ?, ?, ?)',
+                    (username, email, hash_password(password), is_admin, True)
+                )
             
-            # Send welcome email
+            # Queue welcome email
             try:
-                send_welcome_email(email, username, password)
-                flash(f'User {username} created successfully! Welcome email sent to {email}', 'success')
+                queue_welcome_email(email, username, password)
+                flash(f'User {username} created successfully! Welcome email queued for {email}', 'success')
             except Exception as e:
-                flash(f'User created but email failed to send: {str(e)}', 'warning')
+                flash(f'User created but email could not be queued: {str(e)}', 'warning')
             
             return redirect(url_for('admin_users'))
         except Exception as e:
             flash(f'Error creating user: {str(e)}', 'error')
-        finally:
-            conn.close()
     
     return render_template('admin_add_user.html')
 
 @app.route('/admin/edit_user/<int:user_id>', methods=['GET', 'POST'])
 @admin_required
 def admin_edit_user(user_id):
-    conn = get_db_connection()
-    user = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
+    with get_read_connection() as conn:
+        user = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
     
     if not user:
         flash('User not found', 'error')
@@ -151,34 +413,33 @@ def admin_edit_user(user_id):
         try:
             if reset_password:
                 new_password = generate_random_password()
-                conn.execute('''
-                    UPDATE users 
-                    SET username = ?, email = ?, is_admin = ?, active = ?, password_hash = ?
-                    WHERE id = ?
-                ''', (username, email, is_admin, active, new_password, user_id))
+                with get_write_connection() as conn:
+                    conn.execute('''
+                        UPDATE users 
+                        SET username = ?, email = ?, is_admin = ?, active = ?, password_hash = ?
+                        WHERE id = ?
+                    ''', (username, email, is_admin, active, hash_password(new_password), user_id))
                 
-                # Send new password email
+                # Queue new password email
                 try:
-                    send_welcome_email(email, username, new_password, is_reset=True)
-                    flash(f'User updated and new password sent to {email}', 'success')
+                    queue_welcome_email(email, username, new_password, is_reset=True)
+                    flash(f'User updated and new password email queued for {email}', 'success')
                 except Exception as e:
-                    flash(f'User updated but email failed to send: {str(e)}', 'warning')
+                    flash(f'User updated but email could not be queued: {str(e)}', 'warning')
             else:
-                conn.execute('''
-                    UPDATE users 
-                    SET username = ?, email = ?, is_admin = ?, active = ?
-                    WHERE id = ?
-                ''', (username, email, is_admin, active, user_id))
+                with get_write_connection() as conn:
+                    conn.execute('''
+                        UPDATE users 
+                        SET username = ?, email = ?, is_admin = ?, active = ?
+                        WHERE id = ?
+                    ''', (username, email, is_admin, active, user_id))
                 flash('User updated successfully', 'success')
             
-            conn.commit()
+            invalidate_user_cache(user_id)
             return redirect(url_for('admin_users'))
         except Exception as e:
             flash(f'Error updating user: {str(e)}', 'error')
-        finally:
-            conn.close()
     
-    conn.close()
     return render_template('admin_edit_user.html', user=user)
 
 @app.route('/admin/delete_user/<int:user_id>')
@@ -188,23 +449,21 @@ def admin_delete_user(user_id):
         flash('You cannot delete your own account', 'error')
         return redirect(url_for('admin_users'))
     
-    conn = get_db_connection()
     try:
-        # Check if user has articles
-        article_count = conn.execute(
-            'SELECT COUNT(*) as count FROM articles WHERE author_id = ?', (user_id,)
-        ).fetchone()['count']
-        
-        if article_count > 0:
-            flash('Cannot delete user with existing articles. Please reassign or delete articles first.', 'error')
-        else:
-            conn.execute('DELETE FROM users WHERE id = ?', (user_id,))
-            conn.commit()
-            flash('User deleted successfully', 'success')
+        with get_write_connection() as conn:
+            # Check if user has articles
+            article_count = conn.execute(
+                'SELECT COUNT(*) as count FROM articles WHERE author_id = ?', (user_id,)
+            ).fetchone()['count']
+            
+            if article_count > 0:
+                flash('Cannot delete user with existing articles. Please reassign or delete articles first.', 'error')
+            else:
+                conn.execute('DELETE FROM users WHERE id = ?', (user_id,))
+                flash('User deleted successfully', 'success')
+        invalidate_user_cache(user_id)
     except Exception as e:
         flash(f'Error deleting user: {str(e)}', 'error')
-    finally:
-        conn.close()
     
     return redirect(url_for('admin_users'))
 
@@ -217,22 +476,29 @@ def create_article():
         published = 'published' in request.form
         
         image_path = None
+        pending = None
         if 'image' in request.files:
             file = request.files['image']
             if file and file.filename != '' and allowed_file(file.filename):
-                filename = str(uuid.uuid4()) + '.' + secure_filename(file.filename).rsplit('.', 1)[1].lower()
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-                image_path = filename
+                image_path, pending = stage_upload(file)
         
-        conn = get_db_connection()
-        conn.execute('''
-            INSERT INTO articles (title, content, image_path, author_id, published)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (title, content, image_path, session['user_id'], published))
-        conn.commit()
-        conn.close()
+        try:
+            with get_write_connection() as conn:
+                cursor = conn.execute('''
+                    INSERT INTO articles (title, content, image_path, author_id, published)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (title, content, image_path, session['user_id'], published))
+        except Exception:
+            if pending:
+                discard_upload(image_path, pending)
+            raise
         
-        flash('Article created successfully!', 'success')
+        if pending and not commit_upload(image_path, pending):
+            with get_write_connection() as conn:
+                conn.execute('UPDATE articles SET image_path = NULL WHERE id = ?', (cursor.lastrowid,))
+            flash('Article created, but the image could not be saved', 'warning')
+        else:
+            flash('Article created successfully!', 'success')
         return redirect(url_for('dashboard'))
     
     return render_template('create_article.html')
@@ -240,96 +506,126 @@ def create_article():
 @app.route('/edit_article/<int:article_id>', methods=['GET', 'POST'])
 @login_required
 def edit_article(article_id):
-    conn = get_db_connection()
-    article = conn.execute('SELECT * FROM articles WHERE id = ?', (article_id,)).fetchone()
-    
-    if not article:
-        flash('Article not found', 'error')
-        return redirect(url_for('dashboard'))
-    
-    # Check if user can edit this article
-    if not session.get('is_admin') and article['author_id'] != session['user_id']:
-        flash('You can only edit your own articles', 'error')
-        return redirect(url_for('dashboard'))
+    is_admin = int(bool(session.get('is_admin')))
     
     if request.method == 'POST':
         title = request.form['title']
         content = request.form['content']
         published = 'published' in request.form
         
-        image_path = article['image_path']  # Keep existing image by default
+        image_path = None  # NULL keeps the existing image
+        pending = None
+        old_image = None
         
         if 'image' in request.files:
             file = request.files['image']
             if file and file.filename != '' and allowed_file(file.filename):
-                # Delete old image if it exists
-                if image_path:
-                    old_path = os.path.join(app.config['UPLOAD_FOLDER'], image_path)
-                    if os.path.exists(old_path):
-                        os.remove(old_path)
+                image_path, pending = stage_upload(file)
+        
+        try:
+            with get_write_connection() as conn:
+                if pending:
+                    # Same write transaction as the UPDATE, so this can't go stale
+                    row = conn.execute(
+                        'SELECT image_path FROM articles WHERE id = ? AND (author_id = ? OR ? = 1)',
+                        (article_id, session['user_id'], is_admin)
+                    ).fetchone()
+                    old_image = row['image_path'] if row else None
+                    if old_image:
+                        mark_image_deleted(old_image)
                 
-                filename = str(uuid.uuid4()) + '.' + secure_filename(file.filename).rsplit('.', 1)[1].lower()
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-                image_path = filename
+                # Authorization is part of the WHERE clause, so fetching,
+                # checking and updating is a single statement
+                cursor = conn.execute('''
+                    UPDATE articles 
+                    SET title = ?, content = ?, image_path = COALESCE(?, image_path), published = ?,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ? AND (author_id = ? OR ? = 1)
+                ''', (title, content, image_path, published, article_id, session['user_id'], is_admin))
+        except Exception:
+            if pending:
+                discard_upload(image_path, pending)
+            raise
         
-        conn.execute('''
-            UPDATE articles 
-            SET title = ?, content = ?, image_path = ?, published = ?, updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        ''', (title, content, image_path, published, article_id))
-        conn.commit()
-        conn.close()
+        if cursor.rowcount == 0:
+            if pending:
+                discard_upload(image_path, pending)
+            flash('Article not found, or you can only edit your own articles', 'error')
+            return redirect(url_for('dashboard'))
+        
+        if pending:
+            if not commit_upload(image_path, pending):
+                with get_write_connection() as conn:
+                    conn.execute('UPDATE articles SET image_path = ? WHERE id = ?', (old_image, article_id))
+                    if old_image:
+                        unmark_image_deleted(old_image)
+                flash('Article updated, but the new image could not be saved', 'warning')
+                return redirect(url_for('dashboard'))
         
         flash('Article updated successfully!', 'success')
         return redirect(url_for('dashboard'))
     
-    conn.close()
-    return render_template('edit_article.html', article=article)
-
-@app.route('/delete_article/<int:article_id>')
-@login_required
-def delete_article(article_id):
-    conn = get_db_connection()
-    article = conn.execute('SELECT * FROM articles WHERE id = ?', (article_id,)).fetchone()
+    with get_read_connection() as conn:
+        article = conn.execute('SELECT * FROM articles WHERE id = ?', (article_id,)).fetchone()
     
     if not article:
         flash('Article not found', 'error')
         return redirect(url_for('dashboard'))
     
-    # Check if user can delete this article
-    if not session.get('is_admin') and article['author_id'] != session['user_id']:
-        flash('You can only delete your own articles', 'error')
+    # Check if user can edit this article
+    if not is_admin and article['author_id'] != session['user_id']:
+        flash('You can only edit your own articles', 'error')
         return redirect(url_for('dashboard'))
     
-    # Delete associated image
-    if article['image_path']:
-        image_path = os.path.join(app.config['UPLOAD_FOLDER'], article['image_path'])
-        if os.path.exists(image_path):
-            os.remove(image_path)
+    return render_template('edit_article.html', article=article)
+
+@app.route('/delete_article/<int:article_id>')
+@login_required
+def delete_article(article_id):
+    is_admin = int(bool(session.get('is_admin')))
     
-    conn.execute('DELETE FROM articles WHERE id = ?', (article_id,))
-    conn.commit()
-    conn.close()
+    with get_write_connection() as conn:
+        article = conn.execute(
+            'DELETE FROM articles WHERE id = ? AND (author_id = ? OR ? = 1) RETURNING image_path',
+            (article_id, session['user_id'], is_admin)
+        ).fetchone()
+        # The image sweeper unlinks the file once this commits
+        if article and article['image_path']:
+            mark_image_deleted(article['image_path'])
+    
+    if not article:
+        flash('Article not found, or you can only delete your own articles', 'error')
+        return redirect(url_for('dashboard'))
     
     flash('Article deleted successfully!', 'success')
     return redirect(url_for('dashboard'))
 
 @app.route('/article/<int:article_id>')
 def view_article(article_id):
-    conn = get_db_connection()
-    article = conn.execute('''
-        SELECT a.*, u.username 
-        FROM articles a 
-        JOIN users u ON a.author_id = u.id 
-        WHERE a.id = ? AND a.published = TRUE
-    ''', (article_id,)).fetchone()
-    conn.close()
+    etag = None
+    with get_read_connection() as conn:
+        state = conn.execute('''
+            SELECT a.updated_at, u.username
+            FROM articles a JOIN users u ON a.author_id = u.id
+            WHERE a.id = ? AND a.published = TRUE
+        ''', (article_id,)).fetchone()
+        if state:
+            etag = page_etag(article_id, state['updated_at'], state['username'])
+            if etag_matches(etag):
+                return not_modified(etag)
+        
+        article = conn.execute('''
+            SELECT a.*, u.username 
+            FROM articles a 
+            JOIN users u ON a.author_id = u.id 
+            WHERE a.id = ? AND a.published = TRUE
+        ''', (article_id,)).fetchone()
     
     if not article:
         flash('Article not found or not published', 'error')
         return redirect(url_for('index'))
     
-    return render_template('article.html', article=article)
+    return etag_response(etag, render_template('article.html', article=article))
 
 @app.route('/change_password', methods=['GET', 'POST'])
 @login_required
@@ -347,21 +643,22 @@ def change_password():
             flash('Password must be 8-20 characters, include upper and lower case letters, a digit, and a special character.', 'error')
             return render_template('change_password.html')
         
-        conn = get_db_connection()
-        user = conn.execute('SELECT password_hash FROM users WHERE id = ?', (session['user_id'],)).fetchone()
+        # Hash the new password on the pool while the current one is checked
+        pending_hash = hash_password_async(new_password)
+        
+        with get_read_connection() as conn:
+            user = conn.execute('SELECT password_hash FROM users WHERE id = ?', (session['user_id'],)).fetchone()
         
         if verify_password(user['password_hash'], current_password) is False:
+            pending_hash.cancel()
             flash('Current password is incorrect', 'error')
-            conn.close()
             return render_template('change_password.html')
         
-        # Hash the new password
-        hashed = hash_password(new_password)
+        hashed = pending_hash.result()
 
         # Update the password in the database
-        conn.execute('UPDATE users SET password_hash = ? WHERE id = ?', (hashed, session['user_id']))
-        conn.commit()
-        conn.close()
+        with get_write_connection() as conn:
+            conn.execute('UPDATE users SET password_hash = ? WHERE id = ?', (hashed, session['user_id']))
         
         flash('Password changed successfully!', 'success')
         return redirect(url_for('dashboard'))
@@ -370,5 +667,11 @@ def change_password():
 
 if __name__ == '__main__':
     
-    # For production on Raspberry Pi, use host='0.0.0.0' to accept external connections
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # Development server only. In production (e.g. on the Raspberry Pi) run
+    # gunicorn, which sets FLASK_ENV=production: gunicorn -c gunicorn.conf.py app:app
+    
+    # With debug on, the reloader's parent process only watches files; the
+    # workers belong in the child that actually serves requests
+    if not app.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_workers()
+    app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
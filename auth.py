@@ -1,6 +1,15 @@
+import threading
+import time
 from functools import wraps
 from flask import session, redirect, url_for, flash
 
+# Short-lived per-process cache of user rows, keyed by user id
+USER_CACHE_TTL = 30  # seconds
+USER_CACHE_MAXSIZE = 1024
+
+_user_cache = {}
+_user_cache_lock = threading.Lock()
+
 def login_required(f):
     """Decorator to require user login"""
     @wraps(f)
@@ -26,14 +35,38 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-def check_user_active(user_id):
-    """Check if user account is active"""
-    from database import get_db_connection
+def get_user(user_id):
+    """Get a user row by id, served from the TTL cache when fresh"""
+    now = time.monotonic()
+    cached = _user_cache.get(user_id)
+    if cached and cached[0] > now:
+        return cached[1]
     
-    conn = get_db_connection()
-    user = conn.execute('SELECT active FROM users WHERE id = ?', (user_id,)).fetchone()
+    from database import get_read_connection
+    
+    conn = get_read_connection()
+    user = conn.execute('''
+        SELECT id, username, email, is_admin, active, created_at, last_login 
+        FROM users WHERE id = ?
+    ''', (user_id,)).fetchone()
     conn.close()
     
+    with _user_cache_lock:
+        if len(_user_cache) >= USER_CACHE_MAXSIZE:
+            # Evict the oldest entry; dicts keep insertion order
+            _user_cache.pop(next(iter(_user_cache)))
+        _user_cache[user_id] = (now + USER_CACHE_TTL, user)
+    
+    return user
+
+def invalidate_user_cache(user_id):
+    """Drop a cached user row after the user has been changed or deleted"""
+    with _user_cache_lock:
+        _user_cache.pop(user_id, None)
+
+def check_user_active(user_id):
+    """Check if user account is active"""
+    user = get_user(user_id)
     return user and user['active']
 
 def update_last_login(user_id):
@@ -44,22 +77,15 @@ def update_last_login(user_id):
     conn.execute('UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?', (user_id,))
     conn.commit()
     conn.close()
+    
+    invalidate_user_cache(user_id)
 
 def get_current_user():
     """Get current user information from session"""
     if 'user_id' not in session:
         return None
     
-    from database import get_db_connection
-    
-    conn = get_db_connection()
-    user = conn.execute('''
-        SELECT id, username, email, is_admin, active, created_at, last_login 
-        FROM users WHERE id = ?
-    ''', (session['user_id'],)).fetchone()
-    conn.close()
-    
-    return user
+    return get_user(session['user_id'])
 
 def logout_user():
     """Clear user session"""
@@ -11,7 +11,13 @@ class Config:
     # File Upload Configuration
     UPLOAD_FOLDER = 'static/uploads'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
-    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+    ALLOWED_EXTENSIONS = frozenset({'png', 'jpg', 'jpeg', 'gif', 'webp'})
+    UPLOAD_MAX_AGE = timedelta(days=365)  # Uploads are UUID-named and never change
+    # Internal nginx location for uploads (e.g. /protected/uploads/). When set,
+    # /image/<name> answers with X-Accel-Redirect and nginx sends the file.
+    UPLOAD_ACCEL_REDIRECT = os.environ.get('UPLOAD_ACCEL_REDIRECT')
+    IMAGE_SWEEP_INTERVAL = 60  # seconds between passes of the image sweeper
+    IMAGE_SWEEP_GRACE = 60  # seconds a replaced/deleted image is kept before unlinking
     
     # Database Configuration
     DATABASE_PATH = 'vrc6.db'
@@ -25,10 +31,30 @@ class Config:
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')  # Your app password
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER')
     
+    # Email Outbox (background delivery with exponential backoff)
+    EMAIL_POLL_INTERVAL = 30  # seconds between outbox sweeps
+    EMAIL_MAX_ATTEMPTS = 5
+    EMAIL_RETRY_BASE_SECONDS = 30  # doubled after every failed attempt
+    
+    # Unix datagram socket of scripts/activity_logd.py. When set, activity log
+    # entries are handed to that daemon instead of being written in-process.
+    ACTIVITY_LOG_SOCKET = os.environ.get('ACTIVITY_LOG_SOCKET')
+    
+    # Password hashing method, in werkzeug's notation (e.g. 'scrypt',
+    # 'scrypt:65536:8:1', 'pbkdf2:sha256:1000000'). Both run in OpenSSL.
+    # Stored hashes made with other settings are upgraded at the next login.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+    
     # Application Settings
     SITE_NAME = os.environ.get('SITE_NAME')
     SITE_URL = os.environ.get('SITE_URL')
     
+    # Response compression (Flask-Compress). Set COMPRESS_IN_APP=false when
+    # nginx compresses instead, so responses aren't compressed twice
+    COMPRESS_REGISTER = os.environ.get('COMPRESS_IN_APP', 'true').lower() in ['true', 'on', '1']
+    COMPRESS_MIMETYPES = ['text/html', 'text/css', 'application/javascript', 'application/json']
+    COMPRESS_LEVEL = 6
+    
     # Session Configuration
     PERMANENT_SESSION_LIFETIME = timedelta(days=7)
     
@@ -39,11 +65,15 @@ class Config:
 
 class DevelopmentConfig(Config):
     DEBUG = True
+    TEMPLATES_AUTO_RELOAD = True
 
 class ProductionConfig(Config):
     DEBUG = False
     SECRET_KEY = os.environ.get('SECRET_KEY')
     
+    # Templates never change in production; skip Jinja's per-render stat()
+    TEMPLATES_AUTO_RELOAD = False
+    
     # Override with production values
     if not SECRET_KEY:
         raise ValueError("No SECRET_KEY set for production environment")
@@ -1,17 +1,200 @@
+import os
+import queue
 import sqlite3
+import threading
+import time
+from pathlib import Path
 from config import Config
 
-def get_db_connection():
-    """Get a database connection with Row factory for dict-like access"""
-    conn = sqlite3.connect(Config.DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
+# Applied to every connection: WAL lets readers proceed alongside a writer,
+# NORMAL sync is safe under WAL and saves an fsync per commit. Recursive
+# triggers make rows removed by INSERT OR REPLACE fire delete triggers, which
+# the row counts kept by scripts/db_manage.py rely on.
+SQLITE_PRAGMAS = '''
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA recursive_triggers=ON;
+    PRAGMA busy_timeout=5000;
+    PRAGMA cache_size=-20000;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA foreign_keys=ON;
+'''
+
+# Read-only connections cannot change the journal mode; the writer sets it.
+READ_ONLY_PRAGMAS = '''
+    PRAGMA busy_timeout=5000;
+    PRAGMA cache_size=-20000;
+    PRAGMA temp_store=MEMORY;
+'''
+
+def configure_connection(conn, readonly=False):
+    """Apply the performance PRAGMAs to a freshly opened connection"""
+    conn.executescript(READ_ONLY_PRAGMAS if readonly else SQLITE_PRAGMAS)
     return conn
 
-def init_db():
-    """Initialize the SQLite database with all required tables"""
-    conn = sqlite3.connect(Config.DATABASE_PATH)
-    cursor = conn.cursor()
-    
+class PooledConnection:
+    """A connection checked out of a ConnectionPool.
+
+    Behaves like the underlying sqlite3 connection, except that close()
+    hands it back to the pool instead of closing it. Can also be used as a
+    context manager, which commits (or rolls back on error) and releases.
+    A block entered while a transaction is already open joins it and leaves
+    the commit to whoever opened it.
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+        self._released = False
+        self._owns_transaction = False
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        """Return the connection to the pool"""
+        if not self._released:
+            self._released = True
+            self._pool.release(self._conn)
+
+    def __enter__(self):
+        self._owns_transaction = not self._conn.in_transaction
+        if self._pool.immediate and self._owns_transaction:
+            # Take the write lock up front so the transaction never has to
+            # upgrade from a read lock and hit SQLITE_BUSY halfway through
+            self._conn.execute('BEGIN IMMEDIATE')
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if self._owns_transaction:
+                if exc_type is None:
+                    self._conn.commit()
+                else:
+                    self._conn.rollback()
+        finally:
+            self.close()
+        return False
+
+class ConnectionPool:
+    """Fixed-size pool of open SQLite connections shared between threads.
+
+    Connections are opened once and reused, so requests no longer pay for
+    reopening the database file and keep SQLite's page cache warm. A thread
+    that already holds a connection gets the same one back on nested
+    checkouts instead of waiting on the pool.
+    """
+
+    def __init__(self, size, database=None, readonly=False, immediate=False, timeout=30):
+        self.size = size
+        self.timeout = timeout
+        self.database = database or Config.DATABASE_PATH
+        self.readonly = readonly
+        self.immediate = immediate
+        self._queue = queue.Queue(maxsize=size)
+        self._local = threading.local()
+        for _ in range(size):
+            self._queue.put(self._connect())
+
+    def _connect(self):
+        if self.readonly:
+            uri = Path(self.database).resolve().as_uri() + '?mode=ro'
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False, isolation_level=None)
+        else:
+            conn = sqlite3.connect(self.database, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return configure_connection(conn, readonly=self.readonly)
+
+    def acquire(self):
+        """Check out a connection, waiting up to self.timeout seconds for one to be free"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            try:
+                conn = self._queue.get(timeout=self.timeout)
+            except queue.Empty:
+                raise sqlite3.OperationalError(
+                    f"Timed out after {self.timeout}s waiting for a database connection") from None
+            self._local.conn = conn
+            self._local.depth = 0
+        self._local.depth += 1
+        return PooledConnection(self, conn)
+
+    def release(self, conn):
+        """Give a connection back once its outermost checkout is closed"""
+        self._local.depth -= 1
+        if self._local.depth == 0:
+            self._local.conn = None
+            if conn.in_transaction:
+                conn.rollback()
+            self._queue.put(conn)
+
+    def close_all(self):
+        """Close every idle connection in the pool"""
+        while True:
+            try:
+                self._queue.get_nowait().close()
+            except queue.Empty:
+                break
+
+READ_POOL_SIZE = min(os.cpu_count() or 1, 8)
+
+_write_pool = None
+_read_pool = None
+_pool_lock = threading.Lock()
+
+def get_write_pool():
+    """Return the single-connection writer pool, creating it on first use"""
+    global _write_pool
+    if _write_pool is None:
+        with _pool_lock:
+            if _write_pool is None:
+                _write_pool = ConnectionPool(1, immediate=True)
+    return _write_pool
+
+def get_read_pool():
+    """Return the read-only connection pool, creating it on first use"""
+    global _read_pool
+    if _read_pool is None:
+        # The writer opens the database first so the WAL files exist
+        get_write_pool()
+        with _pool_lock:
+            if _read_pool is None:
+                _read_pool = ConnectionPool(READ_POOL_SIZE, readonly=True)
+    return _read_pool
+
+def reset_pools():
+    """Forget pools inherited across fork() so this process opens its own"""
+    global _write_pool, _read_pool, _pool_lock
+    _write_pool = None
+    _read_pool = None
+    _pool_lock = threading.Lock()
+
+def get_read_connection():
+    """Get a pooled read-only connection for SELECT-only work.
+
+    Under WAL these never wait on the writer, so read endpoints scale with
+    the number of pooled connections.
+    """
+    return get_read_pool().acquire()
+
+def get_write_connection():
+    """Get the writer connection.
+
+    Used as a context manager it runs the block in a BEGIN IMMEDIATE
+    transaction, committing on success and rolling back on error.
+    """
+    return get_write_pool().acquire()
+
+def get_db_connection():
+    """Get a pooled database connection with Row factory for dict-like access.
+
+    This is the writer connection, so it is safe for any query. Call close()
+    (or use it in a with block) to return it to the pool.
+    """
+    return get_write_connection()
+
+def create_tables(cursor):
+    """Create any missing tables and indexes"""
     # Users table with additional fields
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -63,22 +246,86 @@ def init_db():
         )
     ''')
     
+    # Outgoing email queue, drained by the background email worker
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recipient TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            body TEXT NOT NULL,
+            attempts INTEGER DEFAULT 0,
+            last_error TEXT,
+            next_retry_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # User activity, written in batches by utils.log_activity
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS activity_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            action TEXT NOT NULL,
+            description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE SET NULL
+        )
+    ''')
+    
+    # Images whose article was deleted or re-uploaded, unlinked by the image sweeper
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS deleted_images (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            path TEXT NOT NULL,
+            deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Indexes for the hot queries: the public article list and per-author
+    # dashboards (users.username and settings.key are already indexed)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_articles_published_created ON articles(published, created_at DESC)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_articles_author ON articles(author_id, created_at DESC)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_activity_user_time ON activity_log(user_id, created_at DESC)')
+    # Lets orphan checks probe a file name instead of scanning every article
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_articles_image ON articles(image_path) WHERE image_path IS NOT NULL')
+
+def ensure_schema():
+    """Create tables added since the database was initialized.
+
+    Run at startup, before the background workers touch the newer tables.
+    """
+    conn = sqlite3.connect(Config.DATABASE_PATH)
+    try:
+        configure_connection(conn)
+        create_tables(conn.cursor())
+        conn.commit()
+    finally:
+        conn.close()
+
+def init_db():
+    """Initialize the SQLite database with all required tables"""
+    conn = sqlite3.connect(Config.DATABASE_PATH)
+    configure_connection(conn)
+    cursor = conn.cursor()
+    
+    create_tables(cursor)
+    
+    # Seed the default admin user and settings in a single transaction
+    cursor.execute('BEGIN')
+    
     # Create default admin user
+    from utils import hash_password
+    
     try:
         cursor.execute(
             "INSERT INTO users (username, email, password_hash, is_admin, active) VALUES (?, ?, ?, ?, ?)",
             (Config.DEFAULT_ADMIN_USERNAME, Config.DEFAULT_ADMIN_EMAIL, 
-             Config.DEFAULT_ADMIN_PASSWORD, True, True)
+             hash_password(Config.DEFAULT_ADMIN_PASSWORD), True, True)
         )
-        conn.commit()
-        print(f"Default admin user created:")
-        print(f"  Username: {Config.DEFAULT_ADMIN_USERNAME}")
-        print(f"  Password: {Config.DEFAULT_ADMIN_PASSWORD}")
-        print(f"  Email: {Config.DEFAULT_ADMIN_EMAIL}")
-        print("⚠️  CHANGE THE DEFAULT PASSWORD IMMEDIATELY!")
+        admin_created = True
     except sqlite3.IntegrityError:
         # Admin user already exists
-        pass
+        admin_created = False
     
     # Insert default settings
     default_settings = [
@@ -88,65 +335,185 @@ def init_db():
         ('max_image_size_mb', '16')
     ]
     
-    for key, value in default_settings:
-        cursor.execute(
-            'INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)',
-            (key, value)
-        )
+    cursor.executemany(
+        'INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)',
+        default_settings
+    )
     
     conn.commit()
+    
+    if admin_created:
+        print(f"Default admin user created:")
+        print(f"  Username: {Config.DEFAULT_ADMIN_USERNAME}")
+        print(f"  Password: {Config.DEFAULT_ADMIN_PASSWORD}")
+        print(f"  Email: {Config.DEFAULT_ADMIN_EMAIL}")
+        print("⚠️  CHANGE THE DEFAULT PASSWORD IMMEDIATELY!")
+    
+    # Refresh planner statistics so the new indexes get picked
+    cursor.execute('ANALYZE')
     conn.close()
     print("Database initialized successfully!")
 
+# Short-lived per-process cache of settings, keyed by setting name. Each
+# gunicorn worker has its own, so entries expire rather than living until
+# the next set_setting in the same process.
+SETTING_CACHE_TTL = 30  # seconds
+SETTING_CACHE_MAXSIZE = 64
+
+# Marks a setting that is not in the table, so misses are cached too
+_MISSING = object()
+
+_setting_cache = {}
+_setting_cache_lock = threading.Lock()
+
 def get_setting(key, default=None):
-    """Get a setting value from the database"""
-    conn = get_db_connection()
-    result = conn.execute('SELECT value FROM settings WHERE key = ?', (key,)).fetchone()
-    conn.close()
-    return result['value'] if result else default
+    """Get a setting value from the database.
+
+    Values are cached for SETTING_CACHE_TTL seconds. set_setting clears this
+    process's cache at once; other worker processes pick up the change when
+    their entry expires.
+    """
+    now = time.monotonic()
+    cached = _setting_cache.get(key)
+    if cached and cached[0] > now:
+        value = cached[1]
+    else:
+        with get_read_connection() as conn:
+            result = conn.execute('SELECT value FROM settings WHERE key = ?', (key,)).fetchone()
+        value = result['value'] if result else _MISSING
+        with _setting_cache_lock:
+            if len(_setting_cache) >= SETTING_CACHE_MAXSIZE:
+                # Evict the oldest entry; dicts keep insertion order
+                _setting_cache.pop(next(iter(_setting_cache)))
+            _setting_cache[key] = (now + SETTING_CACHE_TTL, value)
+    return default if value is _MISSING else value
 
 def set_setting(key, value):
     """Set a setting value in the database"""
-    conn = get_db_connection()
-    conn.execute(
-        'INSERT OR REPLACE INTO settings (key, value, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)',
-        (key, value)
-    )
-    conn.commit()
-    conn.close()
+    with get_write_connection() as conn:
+        conn.execute(
+            'INSERT OR REPLACE INTO settings (key, value, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)',
+            (key, value)
+        )
+    with _setting_cache_lock:
+        _setting_cache.clear()
+
+def enqueue_email(recipient, subject, body):
+    """Add an email to the outbox for the background worker to send"""
+    # Joins the caller's transaction when one is open
+    with get_write_connection() as conn:
+        conn.execute(
+            'INSERT INTO email_outbox (recipient, subject, body) VALUES (?, ?, ?)',
+            (recipient, subject, body)
+        )
+
+def claim_due_emails(limit=20, lease_seconds=300, max_attempts=5):
+    """Claim outbox emails that are due for delivery.
+
+    Claimed rows have their next retry pushed out by lease_seconds, so other
+    worker processes skip them while this one is sending.
+    """
+    with get_write_connection() as conn:
+        rows = conn.execute('''
+            UPDATE email_outbox
+            SET next_retry_at = datetime('now', ?)
+            WHERE id IN (
+                SELECT id FROM email_outbox
+                WHERE attempts < ? AND next_retry_at <= CURRENT_TIMESTAMP
+                ORDER BY id LIMIT ?
+            )
+            RETURNING id, recipient, subject, body, attempts
+        ''', (f'+{lease_seconds} seconds', max_attempts, limit)).fetchall()
+    return rows
+
+def mark_email_sent(email_id):
+    """Remove a delivered email from the outbox"""
+    with get_write_connection() as conn:
+        conn.execute('DELETE FROM email_outbox WHERE id = ?', (email_id,))
+
+def mark_email_failed(email_id, attempts, error, retry_base_seconds=30, max_attempts=5):
+    """Record a failed delivery and schedule a retry with exponential backoff.
+
+    On the last allowed attempt the email is deleted instead, so bodies with
+    credentials in them don't stay in the outbox. Returns True if it was
+    given up on.
+    """
+    with get_write_connection() as conn:
+        if attempts + 1 >= max_attempts:
+            conn.execute('DELETE FROM email_outbox WHERE id = ?', (email_id,))
+            return True
+        
+        delay = retry_base_seconds * (2 ** attempts)
+        conn.execute('''
+            UPDATE email_outbox
+            SET attempts = attempts + 1, last_error = ?, next_retry_at = datetime('now', ?)
+            WHERE id = ?
+        ''', (str(error), f'+{delay} seconds', email_id))
+        return False
+
+def purge_dead_emails(max_attempts=5):
+    """Delete outbox emails that have used up their attempts and return their recipients"""
+    with get_write_connection() as conn:
+        rows = conn.execute(
+            'DELETE FROM email_outbox WHERE attempts >= ? RETURNING recipient', (max_attempts,)
+        ).fetchall()
+    return [row['recipient'] for row in rows]
+
+def mark_image_deleted(path):
+    """Queue an uploaded image for removal by the image sweeper"""
+    # Joins the caller's transaction when one is open
+    with get_write_connection() as conn:
+        conn.execute('INSERT INTO deleted_images (path) VALUES (?)', (path,))
+
+def unmark_image_deleted(path):
+    """Take an image back off the sweeper's list, e.g. when an edit is reverted"""
+    with get_write_connection() as conn:
+        conn.execute('DELETE FROM deleted_images WHERE path = ?', (path,))
+
+def get_deleted_images(grace_seconds=60, limit=100):
+    """Get images queued for removal at least grace_seconds ago"""
+    with get_read_connection() as conn:
+        rows = conn.execute('''
+            SELECT id, path FROM deleted_images
+            WHERE deleted_at <= datetime('now', ?)
+            ORDER BY id LIMIT ?
+        ''', (f'-{grace_seconds} seconds', limit)).fetchall()
+    return rows
+
+def forget_deleted_images(image_ids):
+    """Drop sweeper rows once their files are gone"""
+    with get_write_connection() as conn:
+        conn.executemany('DELETE FROM deleted_images WHERE id = ?', [(i,) for i in image_ids])
 
 def get_user_stats():
     """Get user statistics for admin dashboard"""
-    conn = get_db_connection()
-    stats = {}
-    
-    # Total users
-    stats['total_users'] = conn.execute('SELECT COUNT(*) as count FROM users').fetchone()['count']
-    
-    # Active users
-    stats['active_users'] = conn.execute('SELECT COUNT(*) as count FROM users WHERE active = TRUE').fetchone()['count']
+    with get_read_connection() as conn:
+        # One aggregate pass per table instead of a COUNT(*) per statistic
+        users = conn.execute('''
+            SELECT COUNT(*) AS total,
+                   IFNULL(SUM(active = TRUE), 0) AS active,
+                   IFNULL(SUM(is_admin = TRUE), 0) AS admins
+            FROM users
+        ''').fetchone()
+        articles = conn.execute('''
+            SELECT COUNT(*) AS total,
+                   IFNULL(SUM(published = TRUE), 0) AS published
+            FROM articles
+        ''').fetchone()
     
-    # Admin users
-    stats['admin_users'] = conn.execute('SELECT COUNT(*) as count FROM users WHERE is_admin = TRUE').fetchone()['count']
-    
-    # Total articles
-    stats['total_articles'] = conn.execute('SELECT COUNT(*) as count FROM articles').fetchone()['count']
-    
-    # Published articles
-    stats['published_articles'] = conn.execute('SELECT COUNT(*) as count FROM articles WHERE published = TRUE').fetchone()['count']
-    
-    # Draft articles
-    stats['draft_articles'] = conn.execute('SELECT COUNT(*) as count FROM articles WHERE published = FALSE').fetchone()['count']
-    
-    conn.close()
-    return stats
+    return {
+        'total_users': users['total'],
+        'active_users': users['active'],
+        'admin_users': users['admins'],
+        'total_articles': articles['total'],
+        'published_articles': articles['published'],
+        'draft_articles': articles['total'] - articles['published'],
+    }
 
 def cleanup_old_sessions():
     """Remove expired sessions from the database"""
-    conn = get_db_connection()
-    conn.execute('DELETE FROM user_sessions WHERE expires_at < CURRENT_TIMESTAMP')
-    conn.commit()
-    conn.close()
+    with get_write_connection() as conn:
+        conn.execute('DELETE FROM user_sessions WHERE expires_at < CURRENT_TIMESTAMP')
 
 def backup_database(backup_path):
     """Create a backup of the database"""
@@ -0,0 +1,26 @@
+"""Gunicorn settings for production.
+
+Run with: gunicorn -c gunicorn.conf.py app:app
+"""
+import multiprocessing
+
+bind = '0.0.0.0:5000'
+
+# Set before the app is preloaded, so it always gets ProductionConfig
+raw_env = ['FLASK_ENV=production']
+
+# One process per core, each serving requests on a few threads
+worker_class = 'gthread'
+workers = multiprocessing.cpu_count()
+threads = 4
+
+# Import the app once in the master so workers share it copy-on-write
+preload_app = True
+
+def post_fork(server, worker):
+    """Give each worker its own database connections and background threads"""
+    import database
+    from app import start_background_workers
+    
+    database.reset_pools()
+    start_background_workers()
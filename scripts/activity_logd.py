@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Activity log daemon for vrc6 Ezine
+Receives activity log entries from the app over a Unix datagram socket and writes them in batches
+MOVE THIS FILE TO THE PROJECT ROOT DIRECTORY
+Set ACTIVITY_LOG_SOCKET (e.g. /tmp/vrc6.activity.sock) for both this script and the app.
+While the daemon is down the app writes activity entries itself, so it can be restarted at any time.
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+
+from config import Config
+from utils import write_activity_batch, LOG_BATCH_SIZE, LOG_FLUSH_INTERVAL, LOG_DATAGRAM_SIZE
+
+# Only the owner and group may send, so other local users can't forge entries.
+# Run the app as the same user, or in the same group, as this daemon.
+SOCKET_MODE = 0o660
+
+def open_socket(path):
+    """Bind the datagram socket, replacing a stale one left by a previous run"""
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    # Created without other-user access, so there is no window before chmod
+    old_umask = os.umask(0o777 & ~SOCKET_MODE)
+    try:
+        sock.bind(path)
+    finally:
+        os.umask(old_umask)
+    os.chmod(path, SOCKET_MODE)
+    return sock
+
+def receive_batch(sock):
+    """Wait for an entry, then gather more until the batch is full or time is up"""
+    sock.settimeout(None)
+    batch = [sock.recv(LOG_DATAGRAM_SIZE)]
+    deadline = time.monotonic() + LOG_FLUSH_INTERVAL
+    while len(batch) < LOG_BATCH_SIZE:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        sock.settimeout(remaining)
+        try:
+            batch.append(sock.recv(LOG_DATAGRAM_SIZE))
+        except socket.timeout:
+            break
+    return batch
+
+def is_valid_entry(entry):
+    """Check an entry is [user_id, action, description, created_at] with usable values.
+
+    One bad row would fail the whole batch insert, so anything the
+    activity_log columns can't take is caught here instead.
+    """
+    if not isinstance(entry, list) or len(entry) != 4:
+        return False
+    user_id, action, description, created_at = entry
+    return ((user_id is None or type(user_id) is int)
+            and isinstance(action, str) and action != ''
+            and (description is None or isinstance(description, str))
+            and isinstance(created_at, str))
+
+def decode_entries(datagrams):
+    """Turn datagrams into (user_id, action, description, created_at) rows, skipping bad ones"""
+    entries = []
+    for datagram in datagrams:
+        try:
+            entry = json.loads(datagram)
+        except ValueError:
+            entry = None
+        # Valid JSON of the wrong shape ({}, 5, null, [1, null, ...]) is skipped too
+        if not is_valid_entry(entry):
+            print(f"Skipping malformed entry: {datagram[:100]!r}")
+            continue
+        entries.append(tuple(entry))
+    return entries
+
+def main():
+    path = Config.ACTIVITY_LOG_SOCKET
+    if not path:
+        print("ACTIVITY_LOG_SOCKET is not set.")
+        return 1
+
+    sock = open_socket(path)
+    print(f"Activity log daemon listening on {path}")
+    try:
+        while True:
+            entries = decode_entries(receive_batch(sock))
+            if entries:
+                write_activity_batch(entries)
+    finally:
+        sock.close()
+        os.unlink(path)
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\nActivity log daemon stopped.")
@@ -10,7 +10,9 @@ Make sure to run this script only when you are sure about the operations, as dro
 
 import sqlite3
 import os
+import atexit
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # Import your existing config
@@ -22,68 +24,262 @@ except ImportError:
     DATABASE_PATH = "app.db"
     print("Warning: Could not import Config. Using default database path: app.db")
 
+# Row counts can be kept up to date by triggers in this table, so listing
+# tables doesn't COUNT(*) every one of them. Tracking is opt-in (menu option
+# 5) since it adds triggers to the schema. Set to False to always count
+# directly, even for tracked tables.
+USE_COUNTS_TABLE = True
+COUNTS_TABLE = '_counts'
+
+# Tables that must be counted directly are counted in parallel, each worker
+# on its own read-only connection (WAL readers don't block each other)
+COUNT_WORKERS = 8
+
+def quote_identifier(name):
+    """Quote a table or trigger name for use in SQL"""
+    return '"' + name.replace('"', '""') + '"'
+
+# Applied once when the shared connection is opened. WAL lets the script run
+# alongside the app, and NORMAL sync avoids a full fsync on every commit.
+# recursive_triggers makes rows removed by INSERT OR REPLACE fire the delete
+# count triggers (the app's connections turn it on as well).
+MANAGEMENT_PRAGMAS = """
+    PRAGMA journal_mode=WAL;
+    PRAGMA recursive_triggers=ON;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA busy_timeout=5000;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA mmap_size=268435456;
+    PRAGMA cache_size=-64000;
+"""
+
+# One connection shared by every helper, closed when the script exits
+_conn = None
+
 def get_db_connection():
-    """Get a database connection"""
-    if not os.path.exists(DATABASE_PATH):
-        print(f"Database file '{DATABASE_PATH}' does not exist!")
-        return None
-    return sqlite3.connect(DATABASE_PATH)
+    """Get the shared database connection, opening it on first use"""
+    global _conn
+    if _conn is None:
+        if not os.path.exists(DATABASE_PATH):
+            print(f"Database file '{DATABASE_PATH}' does not exist!")
+            return None
+        _conn = sqlite3.connect(DATABASE_PATH)
+        _conn.executescript(MANAGEMENT_PRAGMAS)
+    return _conn
+
+def close_db_connection():
+    """Close the shared database connection"""
+    global _conn
+    if _conn is not None:
+        _conn.close()
+        _conn = None
 
-def list_tables():
+atexit.register(close_db_connection)
+
+def list_tables(conn=None):
     """List all tables in the database"""
-    conn = get_db_connection()
+    conn = conn or get_db_connection()
     if not conn:
         return []
     
     cursor = conn.cursor()
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name;")
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name != ? ORDER BY name;", (COUNTS_TABLE,))
     tables = [row[0] for row in cursor.fetchall()]
-    conn.close()
     return tables
 
-def get_table_info(table_name):
+def track_row_count(conn, table_name):
+    """Start keeping a table's row count in the counts table and return it.
+
+    The table is counted once and triggers keep the stored count current
+    from then on. Both happen in one transaction, so no write slips between.
+    Writers must have PRAGMA recursive_triggers on, or rows replaced by
+    INSERT OR REPLACE are counted twice.
+    """
+    table = quote_identifier(table_name)
+    name_literal = "'" + table_name.replace("'", "''") + "'"
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {COUNTS_TABLE} (table_name TEXT PRIMARY KEY, n INTEGER NOT NULL)")
+        cursor.execute(f"SELECT COUNT(*) FROM {table}")
+        row_count = cursor.fetchone()[0]
+        cursor.execute(f"INSERT OR REPLACE INTO {COUNTS_TABLE} (table_name, n) VALUES (?, ?)", (table_name, row_count))
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {quote_identifier(f'{COUNTS_TABLE}_{table_name}_insert')}
+            AFTER INSERT ON {table} BEGIN
+                UPDATE {COUNTS_TABLE} SET n = n + 1 WHERE table_name = {name_literal};
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {quote_identifier(f'{COUNTS_TABLE}_{table_name}_delete')}
+            AFTER DELETE ON {table} BEGIN
+                UPDATE {COUNTS_TABLE} SET n = n - 1 WHERE table_name = {name_literal};
+            END
+        """)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return row_count
+
+def track_all_row_counts(conn=None):
+    """Start tracking the row count of every table that can be tracked"""
+    conn = conn or get_db_connection()
+    if not conn:
+        return 0
+    
+    tracked = 0
+    # SQLite doesn't allow triggers on its own sqlite_* tables
+    for table_name in list_tables(conn):
+        if table_name.startswith('sqlite_'):
+            continue
+        try:
+            track_row_count(conn, table_name)
+            tracked += 1
+        except sqlite3.Error as e:
+            print(f"Warning: Could not track row count for '{table_name}': {e}")
+    return tracked
+
+def untrack_all_row_counts(conn=None):
+    """Remove every count trigger and the counts table"""
+    conn = conn or get_db_connection()
+    if not conn:
+        return
+    
+    prefix = COUNTS_TABLE + '_'
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    triggers = cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type='trigger' AND substr(name, 1, ?) = ?",
+        (len(prefix), prefix)
+    ).fetchall()
+    for (trigger,) in triggers:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {quote_identifier(trigger)}")
+    cursor.execute(f"DROP TABLE IF EXISTS {COUNTS_TABLE}")
+    conn.commit()
+
+def get_row_count(conn, table_name):
+    """Get a table's row count, from the counts table when it is tracked"""
+    if USE_COUNTS_TABLE:
+        try:
+            row = conn.execute(f"SELECT n FROM {COUNTS_TABLE} WHERE table_name = ?", (table_name,)).fetchone()
+        except sqlite3.OperationalError:
+            row = None  # Counts table not created yet
+        if row:
+            return row[0]
+    
+    return conn.execute(f"SELECT COUNT(*) FROM {quote_identifier(table_name)}").fetchone()[0]
+
+def count_rows_readonly(table_name):
+    """Count a table's rows on a private read-only connection"""
+    uri = Path(DATABASE_PATH).resolve().as_uri() + '?mode=ro'
+    conn = sqlite3.connect(uri, uri=True)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {quote_identifier(table_name)}").fetchone()[0]
+    finally:
+        conn.close()
+
+def count_rows_parallel(table_names):
+    """Count several tables at once and return {table_name: row_count}"""
+    if len(table_names) < 2:
+        return {name: count_rows_readonly(name) for name in table_names}
+    
+    with ThreadPoolExecutor(max_workers=min(COUNT_WORKERS, len(table_names))) as executor:
+        return dict(zip(table_names, executor.map(count_rows_readonly, table_names)))
+
+def forget_row_count(cursor, table_name):
+    """Remove a dropped table from the counts table (its triggers go with it)"""
+    try:
+        cursor.execute(f"DELETE FROM {COUNTS_TABLE} WHERE table_name = ?", (table_name,))
+    except sqlite3.OperationalError:
+        pass  # No counts table, nothing to forget
+
+def get_table_info(table_name, conn=None):
     """Get information about a specific table"""
-    conn = get_db_connection()
+    conn = conn or get_db_connection()
     if not conn:
         return None
     
     cursor = conn.cursor()
     
     # Get row count
-    cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-    row_count = cursor.fetchone()[0]
+    row_count = get_row_count(conn, table_name)
     
     # Get column info
-    cursor.execute(f"PRAGMA table_info({table_name})")
+    cursor.execute("SELECT * FROM pragma_table_info(?)", (table_name,))
     columns = cursor.fetchall()
     
-    conn.close()
     return {
         'row_count': row_count,
         'columns': columns
     }
 
-def drop_table(table_name):
-    """Drop a specific table"""
-    conn = get_db_connection()
+def get_tables_overview(conn=None):
+    """Get (name, column count, row count) for every table in one sweep"""
+    conn = conn or get_db_connection()
+    if not conn:
+        return []
+    
+    # Column counts come from pragma_table_info and row counts from the
+    # counts table, so this is one query rather than two per table
+    query = """
+        SELECT m.name, (SELECT COUNT(*) FROM pragma_table_info(m.name)), {row_count}
+        FROM sqlite_master m {join}
+        WHERE m.type = 'table' AND m.name != ?
+        ORDER BY m.name
+    """
+    rows = None
+    if USE_COUNTS_TABLE:
+        try:
+            rows = conn.execute(
+                query.format(row_count='c.n', join=f'LEFT JOIN {COUNTS_TABLE} c ON c.table_name = m.name'),
+                (COUNTS_TABLE,)
+            ).fetchall()
+        except sqlite3.OperationalError:
+            pass  # No counts table yet
+    if rows is None:
+        rows = conn.execute(query.format(row_count='NULL', join=''), (COUNTS_TABLE,)).fetchall()
+    
+    # Untracked tables are counted directly, in parallel. Listing never
+    # starts tracking; that changes the schema and is a separate command.
+    counts = {name: row_count for name, _, row_count in rows if row_count is not None}
+    counts.update(count_rows_parallel([name for name, _, row_count in rows if row_count is None]))
+    
+    return [(name, column_count, counts[name]) for name, column_count, _ in rows]
+
+def drop_table(table_name, conn=None, tables=None):
+    """Drop a specific table.
+
+    table_name must be one of the database's tables (pass tables to check
+    against an existing list_tables() result instead of querying again).
+    """
+    conn = conn or get_db_connection()
     if not conn:
         return False
     
+    # Only names that really are tables ever reach the SQL text
+    if table_name not in (tables if tables is not None else list_tables(conn)):
+        raise ValueError(f"Unknown table: {table_name!r}")
+    
     try:
         cursor = conn.cursor()
-        cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
+        cursor.execute(f"DROP TABLE IF EXISTS {quote_identifier(table_name)}")
+        forget_row_count(cursor, table_name)
         conn.commit()
-        conn.close()
         print(f"✅ Table '{table_name}' dropped successfully!")
         return True
     except sqlite3.Error as e:
         print(f"❌ Error dropping table '{table_name}': {e}")
-        conn.close()
+        conn.rollback()
         return False
 
-def drop_all_tables():
-    """Drop all tables in the database"""
-    tables = list_tables()
+def drop_all_tables(conn=None, tables=None):
+    """Drop all tables in the database (or the given list_tables() result)"""
+    conn = conn or get_db_connection()
+    if not conn:
+        return
+    
+    tables = tables if tables is not None else list_tables(conn)
     if not tables:
         print("No tables found to drop.")
         return
@@ -91,43 +287,68 @@ def drop_all_tables():
     print(f"Dropping {len(tables)} tables...")
     success_count = 0
     
+    # All drops share one transaction, so the journal is synced once at the end.
+    # A failed DROP only undoes that statement; the transaction carries on.
+    cursor = conn.cursor()
+    cursor.execute("BEGIN")
     for table in tables:
-        if drop_table(table):
+        try:
+            cursor.execute(f"DROP TABLE IF EXISTS {quote_identifier(table)}")
+            forget_row_count(cursor, table)
             success_count += 1
+            print(f"✅ Table '{table}' dropped")
+        except sqlite3.Error as e:
+            print(f"❌ Error dropping table '{table}': {e}")
+    
+    # Drop the counts table too once no surviving table's triggers write to it
+    prefix = COUNTS_TABLE + '_'
+    cursor.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type='trigger' AND substr(name, 1, ?) = ?",
+        (len(prefix), prefix)
+    )
+    if not cursor.fetchone()[0]:
+        cursor.execute(f"DROP TABLE IF EXISTS {COUNTS_TABLE}")
+    conn.commit()
     
     print(f"✅ Successfully dropped {success_count}/{len(tables)} tables")
 
 def remove_database():
     """Remove the entire database file"""
-    if not os.path.exists(DATABASE_PATH):
-        print(f"Database file '{DATABASE_PATH}' does not exist!")
-        return False
+    # The shared connection must not outlive the file it points at
+    close_db_connection()
     
     try:
-        os.remove(DATABASE_PATH)
-        print(f"✅ Database file '{DATABASE_PATH}' removed successfully!")
-        return True
+        Path(DATABASE_PATH).unlink()
+    except FileNotFoundError:
+        print(f"Database file '{DATABASE_PATH}' does not exist!")
+        return False
     except OSError as e:
         print(f"❌ Error removing database file: {e}")
         return False
+    
+    # WAL mode leaves these beside the database; they are useless without it
+    for suffix in ('-wal', '-shm'):
+        Path(DATABASE_PATH + suffix).unlink(missing_ok=True)
+    
+    print(f"✅ Database file '{DATABASE_PATH}' removed successfully!")
+    return True
 
 def display_tables():
-    """Display all tables with their information"""
-    tables = list_tables()
+    """Display all tables with their information and return the overview shown"""
+    tables = get_tables_overview()
     
     if not tables:
         print("No tables found in the database.")
-        return
+        return tables
     
-    print(f"\n📋 Tables in database '{DATABASE_PATH}':")
-    print("=" * 60)
+    # Build the whole listing first and write it once
+    lines = [f"\n📋 Tables in database '{DATABASE_PATH}':\n", "=" * 60 + "\n"]
+    for i, (table, column_count, row_count) in enumerate(tables, 1):
+        lines.append(f"{i:2d}. {table:<20} ({row_count:,} rows, {column_count} columns)\n")
     
-    for i, table in enumerate(tables, 1):
-        info = get_table_info(table)
-        if info:
-            print(f"{i:2d}. {table:<20} ({info['row_count']:,} rows)")
-        else:
-            print(f"{i:2d}. {table:<20} (error reading info)")
+    sys.stdout.write("".join(lines))
+    sys.stdout.flush()
+    return tables
 
 def main():
     """Main interactive menu"""
@@ -145,34 +366,35 @@ def main():
         print("2. Drop a specific table")
         print("3. Drop ALL tables")
         print("4. Remove entire database file")
-        print("5. Exit")
+        print("5. Track row counts (adds triggers, faster listings)")
+        print("6. Stop tracking row counts")
+        print("7. Exit")
         print("="*50)
         
-        choice = input("Enter your choice (1-5): ").strip()
+        choice = input("Enter your choice (1-7): ").strip()
         
         if choice == '1':
             display_tables()
             
         elif choice == '2':
-            display_tables()
-            tables = list_tables()
-            if not tables:
+            # The listing just shown is this iteration's snapshot of the schema
+            overview = display_tables()
+            if not overview:
                 continue
+            tables = [table for table, _, _ in overview]
                 
             try:
                 table_num = int(input(f"\nEnter table number (1-{len(tables)}): ")) - 1
                 if 0 <= table_num < len(tables):
-                    table_name = tables[table_num]
-                    info = get_table_info(table_name)
+                    table_name, column_count, row_count = overview[table_num]
                     
                     print(f"\n⚠️  About to drop table: {table_name}")
-                    if info:
-                        print(f"   Rows: {info['row_count']:,}")
-                        print(f"   Columns: {len(info['columns'])}")
+                    print(f"   Rows: {row_count:,}")
+                    print(f"   Columns: {column_count}")
                     
                     confirm = input("Are you sure? (yes/no): ").lower()
                     if confirm in ['yes', 'y']:
-                        drop_table(table_name)
+                        drop_table(table_name, tables=tables)
                     else:
                         print("Operation cancelled.")
                 else:
@@ -181,17 +403,17 @@ def main():
                 print("Invalid input! Please enter a number.")
                 
         elif choice == '3':
-            display_tables()
-            tables = list_tables()
-            if not tables:
+            overview = display_tables()
+            if not overview:
                 continue
+            tables = [table for table, _, _ in overview]
                 
             print(f"\n⚠️  About to drop ALL {len(tables)} tables!")
             print("This action cannot be undone!")
             confirm = input("Type 'DROP ALL TABLES' to confirm: ")
             
             if confirm == 'DROP ALL TABLES':
-                drop_all_tables()
+                drop_all_tables(tables=tables)
             else:
                 print("Operation cancelled.")
                 
@@ -208,11 +430,19 @@ def main():
                 print("Operation cancelled.")
                 
         elif choice == '5':
+            tracked = track_all_row_counts()
+            print(f"✅ Tracking row counts for {tracked} tables")
+            
+        elif choice == '6':
+            untrack_all_row_counts()
+            print("✅ Row count tracking removed")
+            
+        elif choice == '7':
             print("Goodbye! 👋")
             break
             
         else:
-            print("Invalid choice! Please enter 1-5.")
+            print("Invalid choice! Please enter 1-7.")
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,55 @@
+import pytest
+import os
+import sys
+import json
+import types
+import importlib.util
+from unittest.mock import patch, MagicMock
+
+# The daemon imports config and utils from the project root; only the names
+# it uses are provided, and only while it loads
+_utils = types.ModuleType('utils')
+_utils.write_activity_batch = MagicMock()
+_utils.LOG_BATCH_SIZE = 100
+_utils.LOG_FLUSH_INTERVAL = 1.0
+_utils.LOG_DATAGRAM_SIZE = 65536
+_config = types.ModuleType('config')
+_config.Config = types.SimpleNamespace(ACTIVITY_LOG_SOCKET=None)
+
+_spec = importlib.util.spec_from_file_location(
+    'activity_logd', os.path.join(os.path.dirname(__file__), '..', 'scripts', 'activity_logd.py'))
+activity_logd = importlib.util.module_from_spec(_spec)
+with patch.dict(sys.modules, {'utils': _utils, 'config': _config}):
+    _spec.loader.exec_module(activity_logd)
+
+def datagram(entry):
+    return json.dumps(entry).encode()
+
+GOOD = [
+    [1, 'login', 'User logged in', '2025-01-01 12:00:00'],
+    [None, 'cleanup', None, '2025-01-01 12:00:01'],
+]
+
+@pytest.mark.parametrize('bad', [
+    b'not json',
+    datagram({}),
+    datagram(5),
+    datagram(None),
+    datagram([1, 'login', 'x']),
+    datagram([1, None, 'x', '2025-01-01 12:00:00']),
+    datagram([1, {'a': 1}, 'x', '2025-01-01 12:00:00']),
+    datagram([1, '', 'x', '2025-01-01 12:00:00']),
+    datagram(['1', 'login', 'x', '2025-01-01 12:00:00']),
+    datagram([True, 'login', 'x', '2025-01-01 12:00:00']),
+    datagram([1, 'login', 5, '2025-01-01 12:00:00']),
+    datagram([1, 'login', 'x', None]),
+])
+def test_decode_entries_skips_bad_entry_among_good(bad):
+    """A bad entry arriving with good ones is dropped; the good ones are kept"""
+    datagrams = [datagram(GOOD[0]), bad, datagram(GOOD[1])]
+    
+    with patch('builtins.print') as mock_print:
+        entries = activity_logd.decode_entries(datagrams)
+    
+    assert entries == [tuple(entry) for entry in GOOD]
+    mock_print.assert_called_once()
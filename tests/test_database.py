@@ -0,0 +1,106 @@
+import pytest
+import sys
+import types
+import sqlite3
+import threading
+
+# database reads Config.DATABASE_PATH when a pool is created; each test
+# points it at its own file
+if 'config' not in sys.modules:
+    sys.modules['config'] = types.ModuleType('config')
+    sys.modules['config'].Config = types.SimpleNamespace(DATABASE_PATH='vrc6.db')
+
+from vrc6 import database
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Fresh pools over an empty database with a single notes table"""
+    path = str(tmp_path / 'test.db')
+    monkeypatch.setattr(database.Config, 'DATABASE_PATH', path)
+    database.reset_pools()
+    with database.get_write_connection() as conn:
+        conn.execute('CREATE TABLE notes (body TEXT)')
+    yield path
+    for pool in (database._write_pool, database._read_pool):
+        if pool is not None:
+            pool.close_all()
+    database.reset_pools()
+
+def count_notes():
+    with database.get_read_connection() as conn:
+        return conn.execute('SELECT COUNT(*) FROM notes').fetchone()[0]
+
+def test_nested_write_connection_joins_outer_transaction(db):
+    with database.get_write_connection() as outer:
+        outer.execute("INSERT INTO notes VALUES ('outer')")
+        with database.get_write_connection() as inner:
+            # Same thread, same connection: no second checkout from the pool
+            assert inner._conn is outer._conn
+            inner.execute("INSERT INTO notes VALUES ('inner')")
+    
+        # The inner block left the commit to the outer one
+        assert outer.in_transaction
+        assert count_notes() == 0
+    
+    assert count_notes() == 2
+
+def test_inner_exception_rolls_back_outer_transaction(db):
+    with pytest.raises(ValueError):
+        with database.get_write_connection() as outer:
+            outer.execute("INSERT INTO notes VALUES ('outer')")
+            with database.get_write_connection() as inner:
+                inner.execute("INSERT INTO notes VALUES ('inner')")
+                raise ValueError('boom')
+    
+    assert count_notes() == 0
+    with database.get_write_connection() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM notes').fetchone()[0] == 0
+
+def test_release_rolls_back_open_transaction(db):
+    conn = database.get_write_connection()
+    conn.execute('BEGIN')
+    conn.execute("INSERT INTO notes VALUES ('abandoned')")
+    conn.close()
+    
+    # The next checkout starts clean rather than inheriting the transaction
+    conn = database.get_write_connection()
+    assert not conn.in_transaction
+    assert conn.execute('SELECT COUNT(*) FROM notes').fetchone()[0] == 0
+    conn.close()
+
+def test_read_pool_rejects_writes(db):
+    with database.get_read_connection() as conn:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("INSERT INTO notes VALUES ('nope')")
+    
+    assert count_notes() == 0
+
+def test_acquire_times_out_when_pool_is_busy(db):
+    pool = database.ConnectionPool(1, database=db, timeout=0.05)
+    held = pool.acquire()
+    errors = []
+    
+    def acquire_elsewhere():
+        try:
+            pool.acquire()
+        except sqlite3.OperationalError as e:
+            errors.append(e)
+    
+    thread = threading.Thread(target=acquire_elsewhere)
+    thread.start()
+    thread.join()
+    held.close()
+    pool.close_all()
+    
+    assert len(errors) == 1
+
+def test_reset_pools_opens_new_connections(db):
+    write_pool = database.get_write_pool()
+    read_pool = database.get_read_pool()
+    
+    database.reset_pools()
+    
+    assert database.get_write_pool() is not write_pool
+    assert database.get_read_pool() is not read_pool
+    write_pool.close_all()
+    read_pool.close_all()
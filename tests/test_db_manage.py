@@ -0,0 +1,59 @@
+import pytest
+import os
+import sys
+import types
+import importlib.util
+
+# db_manage reads Config.DATABASE_PATH at import; each test points it at its own file
+if 'config' not in sys.modules:
+    sys.modules['config'] = types.ModuleType('config')
+    sys.modules['config'].Config = types.SimpleNamespace(DATABASE_PATH='vrc6.db')
+
+_spec = importlib.util.spec_from_file_location(
+    'db_manage', os.path.join(os.path.dirname(__file__), '..', 'scripts', 'db_manage.py'))
+db_manage = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(db_manage)
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    path = tmp_path / 'test.db'
+    path.touch()
+    monkeypatch.setattr(db_manage, 'DATABASE_PATH', str(path))
+    db_manage.close_db_connection()
+    conn = db_manage.get_db_connection()
+    conn.execute('CREATE TABLE settings (key TEXT PRIMARY KEY, value TEXT)')
+    conn.executemany('INSERT INTO settings (key, value) VALUES (?, ?)',
+                     [('a', '1'), ('b', '2'), ('c', '3'), ('d', '4')])
+    conn.commit()
+    yield conn
+    db_manage.close_db_connection()
+
+def count_triggers(conn):
+    return conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type='trigger'").fetchone()[0]
+
+def test_listing_does_not_install_triggers(conn):
+    assert db_manage.get_tables_overview(conn) == [('settings', 2, 4)]
+    assert count_triggers(conn) == 0
+
+def test_tracked_count_after_upserts(conn):
+    assert db_manage.track_all_row_counts(conn) == 1
+
+    # Replacing an existing key deletes the old row; the delete trigger must see it
+    for value in range(5):
+        conn.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)', ('a', str(value)))
+    conn.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)', ('e', '5'))
+    conn.execute('DELETE FROM settings WHERE key = ?', ('b',))
+    conn.commit()
+
+    actual = conn.execute('SELECT COUNT(*) FROM settings').fetchone()[0]
+    assert actual == 4
+    assert db_manage.get_row_count(conn, 'settings') == actual
+    assert db_manage.get_tables_overview(conn) == [('settings', 2, actual)]
+
+def test_untrack_all_row_counts(conn):
+    db_manage.track_all_row_counts(conn)
+    db_manage.untrack_all_row_counts(conn)
+
+    assert count_triggers(conn) == 0
+    assert db_manage.list_tables(conn) == ['settings']
+    assert db_manage.get_row_count(conn, 'settings') == 4
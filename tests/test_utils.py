@@ -1,17 +1,28 @@
 import pytest
 import os
 import sys
+import types
+import sqlite3
+import json
 from unittest.mock import patch, MagicMock
 
-# Mock modules BEFORE importing anything that depends on them
-sys.modules['database'] = MagicMock()
-sys.modules['config'] = MagicMock()
+# Stub modules BEFORE importing anything that depends on them. Plain
+# namespaces are enough here; MagicMock is kept for tests that check calls.
+def _unpatched_database(*args, **kwargs):
+    raise RuntimeError("Tests must patch database access")
 
-# Mock the Config class specifically
-mock_config = MagicMock()
-mock_config.UPLOAD_FOLDER = 'test_uploads'
-mock_config.ALLOWED_EXTENSIONS = {'jpg', 'png', 'gif'}
-sys.modules['config'].Config = mock_config
+sys.modules['database'] = types.ModuleType('database')
+sys.modules['database'].get_db_connection = _unpatched_database
+sys.modules['database'].get_read_connection = _unpatched_database
+
+sys.modules['config'] = types.ModuleType('config')
+sys.modules['config'].Config = types.SimpleNamespace(
+    UPLOAD_FOLDER='test_uploads',
+    DATABASE_PATH='vrc6.db',
+    ALLOWED_EXTENSIONS={'jpg', 'png', 'gif'},
+    PASSWORD_HASH_METHOD='scrypt',
+    ACTIVITY_LOG_SOCKET=None,
+)
 
 # Now we can safely import
 from vrc6 import utils
@@ -28,6 +39,23 @@ def test_generate_random_password(length=12):
     assert any(c.isupper() for c in password)
     assert any(c.isdigit() for c in password)
 
+def test_allowed_file():
+    assert utils.allowed_file('photo.jpg')
+    assert utils.allowed_file('Photo.JPG')
+    assert utils.allowed_file('archive.tar.png')
+    assert utils.allowed_file('.photo.jpg')
+    assert not utils.allowed_file('notes.txt')
+    assert not utils.allowed_file('jpg')
+    assert not utils.allowed_file('.jpg')
+    assert not utils.allowed_file('..jpg')
+    assert not utils.allowed_file('photo.jpg.part')
+
+def test_sanitize_filename():
+    assert utils.sanitize_filename('../../etc/my photo (1).jpg') == 'my_photo_1_.jpg'
+    assert utils.sanitize_filename('a!!@@b.png') == 'a_b.png'
+    assert utils.sanitize_filename('café-menu.png') == 'café-menu.png'
+    assert utils.sanitize_filename('👍 ok.gif') == '_ok.gif'
+
 def test_hash_password(sample_password):
     hashed = utils.hash_password(sample_password)
     #print (f"Hashed password: {hashed}")
@@ -35,10 +63,36 @@ def test_hash_password(sample_password):
     assert len(hashed) > 0
     assert utils.check_password_hash(hashed, sample_password)
 
+def test_hash_password_async(sample_password):
+    hashed = utils.hash_password_async(sample_password).result(timeout=10)
+    assert utils.check_password_hash(hashed, sample_password)
+
 def test_verify_password(sample_password):
     hashed = utils.hash_password(sample_password)
     assert utils.verify_password(hashed, sample_password)
 
+def test_verify_password_plain_text_legacy(sample_password):
+    # Accounts created before hashing stored the password as-is
+    assert utils.verify_password(sample_password, sample_password)
+    assert not utils.verify_password(sample_password, "Wrong@1234")
+
+def test_password_needs_rehash(sample_password):
+    assert not utils.password_needs_rehash(utils.hash_password(sample_password))
+    assert utils.password_needs_rehash(sample_password)
+    # Hashes made with other scrypt parameters are upgraded too
+    assert utils.password_needs_rehash(
+        utils.generate_password_hash(sample_password, method='scrypt:16384:8:1'))
+
+def test_hash_password_method(sample_password, monkeypatch):
+    monkeypatch.setattr(utils.Config, 'PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+    monkeypatch.setattr(utils, '_hash_method_prefix', None)
+    
+    hashed = utils.hash_password(sample_password)
+    assert hashed.startswith('pbkdf2:sha256:1000$')
+    assert utils.verify_password(hashed, sample_password)
+    assert not utils.password_needs_rehash(hashed)
+    assert utils.password_needs_rehash(utils.generate_password_hash(sample_password, method='scrypt'))
+
 def test_is_strong_password(sample_password):
     assert utils.is_strong_password(sample_password)
     assert not utils.is_strong_password("weakpass")
@@ -49,51 +103,195 @@ def test_is_strong_password(sample_password):
     assert not utils.is_strong_password("NoNumber!")
     assert not utils.is_strong_password("ThisPasswordIsWayTooLong123!")
 
+@pytest.fixture
+def mail_config(monkeypatch):
+    for name, value in [('MAIL_SERVER', 'smtp.test'), ('MAIL_PORT', 465), ('MAIL_USERNAME', 'user'),
+                        ('MAIL_PASSWORD', 'secret'), ('MAIL_DEFAULT_SENDER', 'noreply@test')]:
+        monkeypatch.setattr(utils.Config, name, value, raising=False)
+    yield
+    utils.close_smtp()
+
+def test_build_welcome_email(monkeypatch):
+    monkeypatch.setattr(utils.Config, 'SITE_NAME', 'VRC6 {Zine}', raising=False)
+    monkeypatch.setattr(utils.Config, 'SITE_URL', 'https://example.test', raising=False)
+    monkeypatch.setattr(utils, '_welcome_templates', None)
+    
+    subject, body = utils.build_welcome_email('alice', 'P@ss{word}1')
+    assert subject == 'Welcome to VRC6 {Zine}'
+    assert 'Username: alice' in body
+    assert 'Password: P@ss{word}1' in body
+    assert 'Website: https://example.test' in body
+    assert 'VRC6 {Zine} Team' in body
+    
+    subject, body = utils.build_welcome_email('alice', 'secret', is_reset=True)
+    assert subject == 'Password Reset - VRC6 {Zine}'
+    assert 'Your password has been reset by an administrator.' in body
+
+def test_send_notification_email_reuses_connection(mail_config):
+    with patch('vrc6.utils.smtplib.SMTP_SSL') as mock_smtp:
+        assert utils.send_bulk([('a@test', 'Hi', 'One'), ('b@test', 'Hi', 'Two')], workers=1) == 2
+        
+        # One connection and login for both messages
+        mock_smtp.assert_called_once_with('smtp.test', 465)
+        server = mock_smtp.return_value
+        server.login.assert_called_once_with('user', 'secret')
+        assert server.send_message.call_count == 2
+        server.noop.assert_called_once()
+
+def test_send_bulk_in_parallel(mail_config):
+    messages = [(f'user{i}@test', 'Hi', 'Body') for i in range(10)]
+    with patch('vrc6.utils.smtplib.SMTP_SSL') as mock_smtp:
+        assert utils.send_bulk(messages, workers=3) == 10
+        
+        # One connection per worker, each closed when its batch is done
+        assert mock_smtp.call_count == 3
+        assert mock_smtp.return_value.send_message.call_count == 10
+        assert mock_smtp.return_value.quit.call_count == 3
+
+def test_send_notification_email_reconnects_when_dropped(mail_config):
+    with patch('vrc6.utils.smtplib.SMTP_SSL') as mock_smtp:
+        utils.send_notification_email('a@test', 'Hi', 'One')
+        mock_smtp.return_value.noop.side_effect = utils.smtplib.SMTPServerDisconnected()
+        utils.send_notification_email('b@test', 'Hi', 'Two')
+        
+        assert mock_smtp.call_count == 2
+
+class FakeDirEntry:
+    """Stands in for os.DirEntry; size None marks a folder"""
+    def __init__(self, path, size=None):
+        self.path = path
+        self.size = size
+    
+    def is_file(self, follow_symlinks=True):
+        return self.size is not None
+    
+    def is_dir(self, follow_symlinks=True):
+        return self.size is None
+    
+    def stat(self, follow_symlinks=True):
+        return types.SimpleNamespace(st_size=self.size)
+
+def fake_scandir(tree):
+    """Build an os.scandir replacement that lists the folders in tree"""
+    def scandir(path):
+        if path not in tree:
+            raise FileNotFoundError(path)
+        entries = [FakeDirEntry(os.path.join(path, name), size) for name, size in tree[path]]
+        return MagicMock(__enter__=MagicMock(return_value=entries))
+    return scandir
+
 def test_get_storage_usage():
-    usage = utils.get_storage_usage()
+    # Fake the upload folder scan so the test never touches the disk
+    tree = {
+        'uploads': [('a.jpg', 1024), ('nested', None)],
+        os.path.join('uploads', 'nested'): [('b.png', 2048), ('deeper', None)],
+        os.path.join('uploads', 'nested', 'deeper'): [('c.gif', 512)],
+    }
+    utils.invalidate_storage_usage()
+    with patch('vrc6.utils.Config') as mock_config, \
+         patch('vrc6.utils.os.scandir', side_effect=fake_scandir(tree)):
+        mock_config.UPLOAD_FOLDER = 'uploads'
+        usage = utils.get_storage_usage()
+        
+        # A missing upload folder is simply empty
+        mock_config.UPLOAD_FOLDER = 'missing'
+        assert utils.scan_storage_usage() == (0, 0)
+    utils.invalidate_storage_usage()
+    
     assert isinstance(usage, dict)
     assert 'total_size' in usage
     assert 'total_size_formatted' in usage
     assert 'file_count' in usage
     assert isinstance(usage['total_size'], int)
     assert isinstance(usage['file_count'], int)
+    assert usage['total_size'] == 3584
+    assert usage['file_count'] == 3
+
+def test_get_storage_usage_cached():
+    """Test that storage totals are scanned once and then adjusted in place"""
+    utils.invalidate_storage_usage()
+    with patch('vrc6.utils.scan_storage_usage', return_value=(100, 2)) as mock_scan:
+        assert utils.get_storage_usage()['total_size'] == 100
+        utils.update_storage_usage(50)
+        usage = utils.get_storage_usage()
+        
+        assert usage['total_size'] == 150
+        assert usage['file_count'] == 3
+        mock_scan.assert_called_once()
+    utils.invalidate_storage_usage()
+
+def test_format_file_size():
+    assert utils.format_file_size(0) == "0B"
+    assert utils.format_file_size(1023) == "1023.0 B"
+    assert utils.format_file_size(1536) == "1.5 KB"
+    assert utils.format_file_size(1024 ** 2) == "1.0 MB"
+    assert utils.format_file_size(3 * 1024 ** 3) == "3.0 GB"
+    assert utils.format_file_size(2 * 1024 ** 4) == "2048.0 GB"  # GB is the largest unit
+
+def test_get_file_info(tmp_path):
+    path = tmp_path / 'a.jpg'
+    path.write_bytes(b'x' * 1536)
+    
+    info = utils.get_file_info(str(path))
+    assert info.size == 1536
+    assert info['size'] == 1536
+    assert info.size_formatted == "1.5 KB"
+    assert info.modified == os.stat(path).st_mtime
+    assert utils.get_file_size(str(path)) == 1536
+    assert utils.get_file_info(str(tmp_path / 'missing.jpg')) is None
 
 def test_cleanup_orphaned_images():
     """Test cleanup_orphaned_images by mocking its helper functions"""
     
     # Mock the helper functions that cleanup_orphaned_images calls
-    with patch('vrc6.utils.get_referenced_images') as mock_get_referenced:
-        with patch('vrc6.utils.get_upload_files') as mock_get_upload:
+    with patch('vrc6.utils.get_upload_files') as mock_get_upload:
+        with patch('vrc6.utils.find_orphaned_files') as mock_find_orphaned:
             with patch('vrc6.utils.remove_orphaned_files') as mock_remove_orphaned:
                 
                 # Set up mock return values
-                mock_get_referenced.return_value = {'file1.jpg', 'file3.jpg'}
                 mock_get_upload.return_value = {'file1.jpg', 'file2.jpg', 'file3.jpg', 'file4.jpg'}
+                mock_find_orphaned.return_value = {'file2.jpg', 'file4.jpg'}
                 mock_remove_orphaned.return_value = 2  # Return count of removed files
                 
                 # Call the function under test
                 result = utils.cleanup_orphaned_images()
                 
                 # Verify the function calls
-                mock_get_referenced.assert_called_once()
                 mock_get_upload.assert_called_once()
+                mock_find_orphaned.assert_called_once_with(mock_get_upload.return_value)
                 
                 # Verify remove_orphaned_files was called with correct orphaned files
-                expected_orphaned = {'file2.jpg', 'file4.jpg'}  # upload_files - referenced_images
-                mock_remove_orphaned.assert_called_once_with(expected_orphaned)
+                mock_remove_orphaned.assert_called_once_with({'file2.jpg', 'file4.jpg'})
                 
                 # Verify return value
                 assert result == 2
 
+def test_find_orphaned_files():
+    """Test that the set difference against articles runs in SQLite"""
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE articles (id INTEGER PRIMARY KEY, image_path TEXT)')
+    conn.executemany('INSERT INTO articles (image_path) VALUES (?)', [('file1.jpg',), ('file3.jpg',), (None,)])
+    
+    with patch('vrc6.utils.get_read_connection', return_value=conn):
+        result = utils.find_orphaned_files({'file1.jpg', 'file2.jpg', 'file3.jpg', 'file4.jpg'})
+    
+    assert result == {'file2.jpg', 'file4.jpg'}
+
+def test_find_orphaned_files_empty():
+    """Test that no upload files means no database round trip"""
+    with patch('vrc6.utils.get_read_connection') as mock_get_conn:
+        assert utils.find_orphaned_files(set()) == set()
+        mock_get_conn.assert_not_called()
+
 def test_get_referenced_images():
     """Test get_referenced_images function separately"""
     mock_conn = MagicMock()
     mock_cursor = MagicMock()
     
+    # NULL and empty paths are filtered by the query itself
     mock_cursor.fetchall.return_value = [
-        {'image_path': 'file1.jpg'},
-        {'image_path': 'file3.jpg'},
-        {'image_path': None}  # Test null handling
+        ('file1.jpg',),
+        ('file3.jpg',),
     ]
     mock_conn.execute.return_value = mock_cursor
     
@@ -102,111 +300,215 @@ def test_get_referenced_images():
         
         expected = {'file1.jpg', 'file3.jpg'}
         assert result == expected
+        assert 'image_path IS NOT NULL' in mock_conn.execute.call_args[0][0]
         mock_conn.close.assert_called_once()
 
-def test_get_upload_files():
+def test_get_upload_files(tmp_path):
     """Test get_upload_files function separately"""
-    with patch('glob.glob') as mock_glob:
-        with patch('os.path.basename', side_effect=lambda x: x.split('/')[-1]):
-            
-            # Mock glob.glob to return different file patterns
-            def glob_side_effect(pattern):
-                if pattern.endswith('*.jpg'):
-                    return ['/upload/file1.jpg', '/upload/file2.jpg']
-                elif pattern.endswith('*.png'):
-                    return ['/upload/file3.png']
-                return []
-            
-            mock_glob.side_effect = glob_side_effect
-            
-            # Mock Config.ALLOWED_EXTENSIONS
-            with patch('vrc6.utils.Config') as mock_config:
-                mock_config.ALLOWED_EXTENSIONS = ['jpg', 'png']
-                mock_config.UPLOAD_FOLDER = '/upload'
-                
-                result = utils.get_upload_files()
-                
-                expected = {'file1.jpg', 'file2.jpg', 'file3.png'}
-                assert result == expected
+    for name in ['file1.jpg', 'file2.jpg', 'file3.png', 'notes.txt', 'upload.png.part']:
+        (tmp_path / name).write_bytes(b'')
+    (tmp_path / 'folder.jpg').mkdir()  # Directories are skipped
+    
+    # Mock Config.ALLOWED_EXTENSIONS
+    with patch('vrc6.utils.Config') as mock_config:
+        mock_config.ALLOWED_EXTENSIONS = ['jpg', 'png']
+        mock_config.UPLOAD_FOLDER = str(tmp_path)
+        
+        result = utils.get_upload_files()
+        
+        expected = {'file1.jpg', 'file2.jpg', 'file3.png'}
+        assert result == expected
+        
+        # A missing upload folder just means there are no files
+        mock_config.UPLOAD_FOLDER = str(tmp_path / 'missing')
+        assert utils.get_upload_files() == set()
 
 def test_remove_orphaned_files():
     """Test remove_orphaned_files function separately"""
-    orphaned_files = {'file1.jpg', 'file2.jpg', 'file3.jpg'}
+    orphaned_files = {'file1.jpg', 'file2.jpg', 'file3.jpg', 'file4.jpg'}
     
-    with patch('os.remove') as mock_remove:
+    with patch('os.unlink') as mock_unlink:
         with patch('os.path.join', side_effect=lambda *args: '/'.join(args)):
-            with patch('builtins.print'):  # Suppress print output
+            with patch('builtins.print') as mock_print:
                 with patch('vrc6.utils.Config') as mock_config:
                     mock_config.UPLOAD_FOLDER = '/upload'
                     
-                    # Mock successful removal of 2 files, failure on 1
-                    def remove_side_effect(path):
+                    # Mock successful removal of 2 files, failure on 1, and 1 already gone
+                    def unlink_side_effect(path):
                         if 'file2.jpg' in path:
                             raise OSError("Permission denied")
+                        if 'file4.jpg' in path:
+                            raise FileNotFoundError(path)
                         return None
                     
-                    mock_remove.side_effect = remove_side_effect
+                    mock_unlink.side_effect = unlink_side_effect
                     
                     result = utils.remove_orphaned_files(orphaned_files)
                     
                     # Should return 2 (successfully removed files)
                     assert result == 2
                     
-                    # Verify os.remove was called for all files
-                    assert mock_remove.call_count == 3
+                    # Verify os.unlink was called for all files
+                    assert mock_unlink.call_count == 4
+                    
+                    # One summary line for the removals and one for the failure
+                    mock_print.assert_any_call("Removed 2 orphaned files")
+                    mock_print.assert_any_call("Failed to remove 1 orphaned files: file2.jpg (Permission denied)")
+                    assert mock_print.call_count == 2
 
-def test_log_activity_success():
-    """Test successful activity logging"""
+LOG_SQL = '''
+            INSERT INTO activity_log (user_id, action, description, created_at) 
+            VALUES (?, ?, ?, ?)
+        '''
+LOG_TIME = '2025-01-01 12:00:00'
+
+@pytest.fixture
+def log_buffer():
+    """Give each activity-log test an empty queue and no background writer"""
+    with patch('vrc6.utils._log_queue', utils.queue.Queue(maxsize=100)), \
+         patch('vrc6.utils.start_log_flusher'), \
+         patch('vrc6.utils.sqlite_timestamp', return_value=LOG_TIME):
+        yield
+
+def make_log_conn():
     mock_conn = MagicMock()
+    mock_conn.in_transaction = False
+    return mock_conn
+
+def test_log_activity_success(log_buffer):
+    """Test successful activity logging"""
+    mock_conn = make_log_conn()
     
     with patch('vrc6.utils.get_db_connection', return_value=mock_conn):
-        # Call the function
+        # Call the function: the entry is only queued
         utils.log_activity(user_id=1, action='login', description='User logged in')
+        mock_conn.executemany.assert_not_called()
+        
+        utils.flush_activity_log()
         
         # Verify database operations
-        mock_conn.execute.assert_called_once_with(
-            '''
-            INSERT INTO activity_log (user_id, action, description, created_at) 
-            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-        ''', (1, 'login', 'User logged in')
-        )
+        mock_conn.execute.assert_called_once_with('BEGIN IMMEDIATE')
+        mock_conn.executemany.assert_called_once_with(LOG_SQL, [(1, 'login', 'User logged in', LOG_TIME)])
         mock_conn.commit.assert_called_once()
         mock_conn.close.assert_called_once()
 
-def test_log_activity_without_description():
+def test_log_activity_without_description(log_buffer):
     """Test activity logging without description (None value)"""
-    mock_conn = MagicMock()
+    mock_conn = make_log_conn()
     
     with patch('vrc6.utils.get_db_connection', return_value=mock_conn):
         # Call the function without description
         utils.log_activity(user_id=5, action='logout')
+        utils.flush_activity_log()
         
         # Verify database operations
-        mock_conn.execute.assert_called_once_with(
-            '''
-            INSERT INTO activity_log (user_id, action, description, created_at) 
-            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-        ''', (5, 'logout', None)
-        )
+        mock_conn.executemany.assert_called_once_with(LOG_SQL, [(5, 'logout', None, LOG_TIME)])
         mock_conn.commit.assert_called_once()
         mock_conn.close.assert_called_once()
 
-def test_log_activity_database_error():
-    """Test activity logging when database operation fails"""
+def test_collect_activity_batch(log_buffer):
+    """Test that the background writer takes at most one batch at a time"""
+    with patch('vrc6.utils.LOG_BATCH_SIZE', 2), patch('vrc6.utils.LOG_FLUSH_INTERVAL', 0.01):
+        for user_id, action in [(1, 'a'), (2, 'b'), (3, 'c')]:
+            utils.log_activity(user_id=user_id, action=action)
+        
+        assert utils.collect_activity_batch() == [(1, 'a', None, LOG_TIME), (2, 'b', None, LOG_TIME)]
+        # The rest goes out once the flush interval has passed
+        assert utils.collect_activity_batch() == [(3, 'c', None, LOG_TIME)]
+
+def test_stop_log_flusher_writes_pending(log_buffer):
+    """Test that shutdown waits for the background writer's batch"""
+    mock_conn = make_log_conn()
+    
+    with patch('vrc6.utils.get_db_connection', return_value=mock_conn), \
+         patch('vrc6.utils.LOG_FLUSH_INTERVAL', 3600):
+        utils.log_activity(user_id=1, action='a')
+        flusher = utils.threading.Thread(target=utils.activity_log_flusher, daemon=True)
+        flusher.start()
+        
+        with patch('vrc6.utils._log_flusher', flusher):
+            utils.stop_log_flusher()
+        
+        assert not flusher.is_alive()
+        mock_conn.executemany.assert_called_once_with(LOG_SQL, [(1, 'a', None, LOG_TIME)])
+
+@pytest.fixture
+def log_socket(monkeypatch):
+    """Point activity logging at a Unix socket bound by the test"""
+    path = f'/tmp/vrc6-test-{os.getpid()}.sock'
+    daemon = utils.socket.socket(utils.socket.AF_UNIX, utils.socket.SOCK_DGRAM)
+    daemon.bind(path)
+    monkeypatch.setattr(utils.Config, 'ACTIVITY_LOG_SOCKET', path)
+    monkeypatch.setattr(utils, '_log_socket', None)
+    monkeypatch.setattr(utils, '_log_socket_retry_at', 0)
+    yield daemon
+    if utils._log_socket is not None:
+        utils._log_socket.close()
+    daemon.close()
+    if os.path.exists(path):
+        os.unlink(path)
+
+def test_log_activity_sends_to_daemon(log_buffer, log_socket):
+    utils.log_activity(user_id=1, action='login')
+    
+    assert json.loads(log_socket.recv(65536)) == [1, 'login', None, LOG_TIME]
+    assert utils._log_queue.empty()
+
+def test_log_activity_falls_back_without_daemon(log_buffer, log_socket):
+    log_socket.close()
+    os.unlink(utils.Config.ACTIVITY_LOG_SOCKET)
+    
+    utils.log_activity(user_id=1, action='login')
+    
+    assert utils._log_queue.get_nowait() == (1, 'login', None, LOG_TIME)
+    assert utils._log_socket_retry_at > 0  # Not retried on every call
+
+def test_log_activity_drops_when_queue_full(log_buffer):
+    """Test that a full queue drops the entry instead of blocking the request"""
+    with patch('vrc6.utils._log_queue', utils.queue.Queue(maxsize=1)), \
+         patch('builtins.print') as mock_print:
+        utils.log_activity(user_id=1, action='a')
+        utils.log_activity(user_id=2, action='b')
+        
+        mock_print.assert_called_once_with("Activity log queue full, dropped 'b' for user 2")
+        assert utils._log_queue.qsize() == 1
+
+def test_log_activity_flush_with_nothing_pending(log_buffer):
+    """Test that flushing an empty buffer doesn't touch the database"""
+    with patch('vrc6.utils.get_db_connection') as mock_get_conn:
+        utils.flush_activity_log()
+        mock_get_conn.assert_not_called()
+
+def test_log_activity_joins_open_transaction(log_buffer):
+    """Test that a flush inside the caller's transaction leaves the commit to the caller"""
     mock_conn = MagicMock()
-    # Make execute raise an exception
-    mock_conn.execute.side_effect = Exception("Database connection failed")
+    mock_conn.in_transaction = True
+    
+    with patch('vrc6.utils.get_db_connection', return_value=mock_conn):
+        utils.log_activity(user_id=7, action='edit')
+        utils.flush_activity_log()
+        
+        mock_conn.execute.assert_not_called()
+        mock_conn.executemany.assert_called_once_with(LOG_SQL, [(7, 'edit', None, LOG_TIME)])
+        mock_conn.commit.assert_not_called()
+
+def test_log_activity_database_error(log_buffer):
+    """Test activity logging when database operation fails"""
+    mock_conn = make_log_conn()
+    # Make executemany raise an exception
+    mock_conn.executemany.side_effect = Exception("Database connection failed")
     
     with patch('vrc6.utils.get_db_connection', return_value=mock_conn):
         with patch('builtins.print') as mock_print:
             # Call the function - should handle exception gracefully
             utils.log_activity(user_id=3, action='create_post', description='New post created')
+            utils.flush_activity_log()
             
             # Verify the error was printed
             mock_print.assert_called_once_with("Activity logging failed: Database connection failed")
             
-            # Verify execute was attempted
-            mock_conn.execute.assert_called_once()
+            # Verify executemany was attempted
+            mock_conn.executemany.assert_called_once()
             
             # Verify commit was NOT called due to exception
             mock_conn.commit.assert_not_called()
@@ -214,9 +516,9 @@ def test_log_activity_database_error():
             # Verify connection was still closed in finally block
             mock_conn.close.assert_called_once()
 
-def test_log_activity_commit_error():
-    """Test activity logging when commit fails but execute succeeds"""
-    mock_conn = MagicMock()
+def test_log_activity_commit_error(log_buffer):
+    """Test activity logging when commit fails but executemany succeeds"""
+    mock_conn = make_log_conn()
     # Make commit raise an exception
     mock_conn.commit.side_effect = Exception("Commit failed")
     
@@ -224,16 +526,14 @@ def test_log_activity_commit_error():
         with patch('builtins.print') as mock_print:
             # Call the function
             utils.log_activity(user_id=2, action='update_profile', description='Profile updated')
+            utils.flush_activity_log()
             
             # Verify the error was printed
             mock_print.assert_called_once_with("Activity logging failed: Commit failed")
             
-            # Verify execute was called successfully
-            mock_conn.execute.assert_called_once_with(
-                '''
-            INSERT INTO activity_log (user_id, action, description, created_at) 
-            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-        ''', (2, 'update_profile', 'Profile updated')
+            # Verify executemany was called successfully
+            mock_conn.executemany.assert_called_once_with(
+                LOG_SQL, [(2, 'update_profile', 'Profile updated', LOG_TIME)]
             )
             
             # Verify commit was attempted
@@ -242,25 +542,27 @@ def test_log_activity_commit_error():
             # Verify connection was still closed
             mock_conn.close.assert_called_once()
 
-def test_log_activity_connection_close_error():
+def test_log_activity_connection_close_error(log_buffer):
     """Test activity logging when connection.close() fails"""
-    mock_conn = MagicMock()
+    mock_conn = make_log_conn()
     # Make close raise an exception - this shouldn't affect the logging
     mock_conn.close.side_effect = Exception("Close failed")
     
     with patch('vrc6.utils.get_db_connection', return_value=mock_conn):
+        utils.log_activity(user_id=4, action='delete_post', description='Post deleted')
+        
         # The close error should not be caught/handled by the function
         with pytest.raises(Exception, match="Close failed"):
-            utils.log_activity(user_id=4, action='delete_post', description='Post deleted')
+            utils.flush_activity_log()
         
         # Verify the main operations completed successfully
-        mock_conn.execute.assert_called_once()
+        mock_conn.executemany.assert_called_once()
         mock_conn.commit.assert_called_once()
         mock_conn.close.assert_called_once()
 
-def test_log_activity_with_various_data_types():
+def test_log_activity_with_various_data_types(log_buffer):
     """Test activity logging with different parameter types"""
-    mock_conn = MagicMock()
+    mock_conn = make_log_conn()
     
     test_cases = [
         # (user_id, action, description)
@@ -273,23 +575,20 @@ def test_log_activity_with_various_data_types():
     
     with patch('vrc6.utils.get_db_connection', return_value=mock_conn):
         for user_id, action, description in test_cases:
-            mock_conn.reset_mock()  # Reset mock between calls
-            
             utils.log_activity(user_id=user_id, action=action, description=description)
-            
-            # Verify correct parameters were passed
-            mock_conn.execute.assert_called_once_with(
-                '''
-            INSERT INTO activity_log (user_id, action, description, created_at) 
-            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-        ''', (user_id, action, description)
-            )
-            mock_conn.commit.assert_called_once()
-            mock_conn.close.assert_called_once()
+        
+        utils.flush_activity_log()
+        
+        # Verify every entry went out, in order, in a single batch
+        mock_conn.executemany.assert_called_once_with(
+            LOG_SQL, [case + (LOG_TIME,) for case in test_cases]
+        )
+        mock_conn.commit.assert_called_once()
+        mock_conn.close.assert_called_once()
 
-def test_log_activity_sql_injection_safety():
+def test_log_activity_sql_injection_safety(log_buffer):
     """Test that the function uses parameterized queries (safe from SQL injection)"""
-    mock_conn = MagicMock()
+    mock_conn = make_log_conn()
     
     # Malicious input that would cause SQL injection if not properly parameterized
     malicious_user_id = "1; DROP TABLE activity_log; --"
@@ -302,18 +601,16 @@ def test_log_activity_sql_injection_safety():
             action=malicious_action, 
             description=malicious_description
         )
+        utils.flush_activity_log()
         
         # Verify the malicious strings are passed as parameters (safe)
-        mock_conn.execute.assert_called_once_with(
-            '''
-            INSERT INTO activity_log (user_id, action, description, created_at) 
-            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-        ''', (malicious_user_id, malicious_action, malicious_description)
+        mock_conn.executemany.assert_called_once_with(
+            LOG_SQL, [(malicious_user_id, malicious_action, malicious_description, LOG_TIME)]
         )
         
         # The SQL query itself should remain unchanged (not modified by the input)
-        call_args = mock_conn.execute.call_args
+        call_args = mock_conn.executemany.call_args
         sql_query = call_args[0][0]
         assert "DROP TABLE" not in sql_query
         assert "DELETE FROM" not in sql_query
-        assert "UPDATE users" not in sql_query
\ No newline at end of file
+        assert "UPDATE users" not in sql_query
@@ -1,81 +1,78 @@
 import os
+import hmac
 import smtplib
 import secrets
 import string
 import re
-import math
-import glob
-from database import get_db_connection
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import json
+import queue
+import socket
+import time
+import atexit
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from database import get_db_connection, get_read_connection
+from email.message import EmailMessage
 from config import Config
 from PIL import Image
 from werkzeug.security import generate_password_hash, check_password_hash
 
+def get_file_extension(filename):
+    """Return the lowercased extension of a filename, without the dot"""
+    return os.path.splitext(filename)[1][1:].lower()
+
+# Allowed extensions as '.ext' suffixes, for a single endswith() check
+_ALLOWED_SUFFIXES = tuple('.' + ext.lower() for ext in Config.ALLOWED_EXTENSIONS)
+_MAX_SUFFIX_LENGTH = max(map(len, _ALLOWED_SUFFIXES), default=0)
+
 def allowed_file(filename):
     """Check if uploaded file has allowed extension"""
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
+    # Only the tail is lowercased, however long the name is. A name needs a
+    # stem before the extension, so '.jpg' or '..jpg' isn't allowed but a
+    # dotfile like '.photo.jpg' is.
+    return (filename[-_MAX_SUFFIX_LENGTH:].lower().endswith(_ALLOWED_SUFFIXES)
+            and filename.rpartition('.')[0].lstrip('.') != '')
+
+# Password alphabet and a byte translation table over it. Bytes past the
+# largest multiple of the alphabet size are dropped, so every character is
+# equally likely.
+_PASSWORD_CLASSES = (string.ascii_lowercase, string.ascii_uppercase, string.digits, "!@#$%^&*")
+_PASSWORD_ALPHABET = ''.join(_PASSWORD_CLASSES).encode()
+_PASSWORD_BYTE_LIMIT = 256 - 256 % len(_PASSWORD_ALPHABET)
+_PASSWORD_TABLE = bytes(_PASSWORD_ALPHABET[b % len(_PASSWORD_ALPHABET)] for b in range(256))
+_PASSWORD_REJECT = bytes(range(_PASSWORD_BYTE_LIMIT, 256))
+_PASSWORD_CLASS_SETS = tuple(frozenset(chars) for chars in _PASSWORD_CLASSES)
 
 def generate_random_password(length=12):
     """Generate a secure random password"""
     if length < 8:
         raise ValueError("Password length must be at least 8 characters.")
-
-    # Define character sets
-    lowercase = string.ascii_lowercase
-    uppercase = string.ascii_uppercase
-    digits = string.digits
-    special = "!@#$%^&*"
-    all_chars = lowercase + uppercase + digits + special
-
-    # Guarantee at least one character from each set
-    password = [
-        secrets.choice(lowercase),
-        secrets.choice(uppercase),
-        secrets.choice(digits),
-        secrets.choice(special)
-    ]
-
-    # Fill the rest with random characters from all sets
-    for _ in range(length - 4):
-        password.append(secrets.choice(all_chars))
     
-    # Shuffle to avoid predictable positioning
-    secrets.SystemRandom().shuffle(password)
-
-    return ''.join(password)
+    while True:
+        # One random read mapped through the table in C, rather than a
+        # secrets.choice() call per character. It is sized for a few
+        # candidates, so a redraw rarely needs another read.
+        pool = secrets.token_bytes(length * 4).translate(_PASSWORD_TABLE, _PASSWORD_REJECT)
+        
+        # Take candidates from consecutive slices until lower, upper, digit
+        # and special all appear
+        for start in range(0, len(pool) - length + 1, length):
+            password = pool[start:start + length].decode()
+            if all(not chars.isdisjoint(password) for chars in _PASSWORD_CLASS_SETS):
+                return password
 
-def send_welcome_email(email, username, password, is_reset=False):
-    """Send welcome email to new users with login credentials"""
-    
-    # Check if email configuration is available
-    if not Config.MAIL_USERNAME or not Config.MAIL_PASSWORD:
-        raise Exception("Email configuration not set. Please configure MAIL_USERNAME and MAIL_PASSWORD.")
-    
-    # Create message
-    msg = MIMEMultipart()
-    msg['From'] = Config.MAIL_DEFAULT_SENDER
-    msg['To'] = email
-    
-    if is_reset:
-        msg['Subject'] = f"Password Reset - {Config.SITE_NAME}"
-        email_type = "password has been reset"
-        action_text = "Your password has been reset by an administrator."
-    else:
-        msg['Subject'] = f"Welcome to {Config.SITE_NAME}"
-        email_type = "account has been created"
-        action_text = "Your account has been created by an administrator."
-    
-    # Email body
-    body = f"""
+# Welcome / password reset email text. The site name and URL are filled in
+# once, the first time an email is built, leaving only the per-user fields
+_WELCOME_EMAIL_BODY = """
     Hello {username},
 
     {action_text}
 
     Here are your login credentials:
     
-    Website: {Config.SITE_URL}
+    Website: {site_url}
     Username: {username}
     Password: {password}
     
@@ -89,90 +86,244 @@ def send_welcome_email(email, username, password, is_reset=False):
     If you have any questions or need help, please contact the administrator.
     
     Best regards,
-    {Config.SITE_NAME} Team
+    {site_name} Team
     
     ---
     This is an automated message. Please do not reply to this email.
     """
+
+_welcome_templates = None
+
+def get_welcome_templates():
+    """Return (subject, body template) pairs keyed by is_reset, built on first use"""
+    global _welcome_templates
+    if _welcome_templates is None:
+        site_name = str(Config.SITE_NAME)
+        site = {
+            # Braces in the site settings must survive the later format_map
+            'site_name': site_name.replace('{', '{{').replace('}', '}}'),
+            'site_url': str(Config.SITE_URL).replace('{', '{{').replace('}', '}}'),
+            'username': '{username}',
+            'password': '{password}',
+        }
+        _welcome_templates = {
+            False: (f"Welcome to {site_name}", _WELCOME_EMAIL_BODY.format_map(
+                dict(site, action_text="Your account has been created by an administrator."))),
+            True: (f"Password Reset - {site_name}", _WELCOME_EMAIL_BODY.format_map(
+                dict(site, action_text="Your password has been reset by an administrator."))),
+        }
+    return _welcome_templates
+
+def build_welcome_email(username, password, is_reset=False):
+    """Build the subject and body of the welcome / password reset email"""
+    subject, body = get_welcome_templates()[bool(is_reset)]
+    return subject, body.format_map({'username': username, 'password': password})
+
+def send_welcome_email(email, username, password, is_reset=False):
+    """Send welcome email to new users with login credentials"""
     
-    msg.attach(MIMEText(body, 'plain'))
+    # Check if email configuration is available
+    if not Config.MAIL_USERNAME or not Config.MAIL_PASSWORD:
+        raise Exception("Email configuration not set. Please configure MAIL_USERNAME and MAIL_PASSWORD.")
     
-    # Send email
-    try:
+    subject, body = build_welcome_email(username, password, is_reset)
+    return send_notification_email(email, subject, body)
+
+# Each thread keeps one logged-in SMTP connection and reuses it across sends,
+# instead of paying the TLS handshake and login for every message. The
+# connection is replaced after this many messages.
+SMTP_MAX_MESSAGES = 100
+
+_smtp_local = threading.local()
+
+def get_smtp():
+    """Return this thread's SMTP connection, reconnecting if it was dropped"""
+    server = getattr(_smtp_local, 'server', None)
+    if server is not None:
+        if _smtp_local.sent >= SMTP_MAX_MESSAGES:
+            close_smtp()
+            server = None
+        else:
+            try:
+                server.noop()
+            except (smtplib.SMTPServerDisconnected, OSError):
+                close_smtp()
+                server = None
+    
+    if server is None:
         server = smtplib.SMTP_SSL(Config.MAIL_SERVER, Config.MAIL_PORT)
         server.login(Config.MAIL_USERNAME, Config.MAIL_PASSWORD)
-        text = msg.as_string()
-        server.sendmail(Config.MAIL_DEFAULT_SENDER, email, text)
-        server.quit()
-        return True
-    except Exception as e:
-        raise Exception(f"Failed to send email: {str(e)}")
+        _smtp_local.server = server
+        _smtp_local.sent = 0
+    return server
+
+def close_smtp():
+    """Close this thread's SMTP connection, if it has one"""
+    server = getattr(_smtp_local, 'server', None)
+    _smtp_local.server = None
+    if server is not None:
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+atexit.register(close_smtp)
+
+def build_notification_message(to_email, subject, message):
+    """Build the MIME message for a notification email"""
+    # Plain text only, so a single-part message with no multipart framing
+    msg = EmailMessage()
+    msg['From'] = Config.MAIL_DEFAULT_SENDER
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    
+    msg.set_content(message)
+    return msg
 
-def send_notification_email(to_email, subject, message):
+def send_notification_email(to_email, subject, message, server=None):
     """Send a general notification email"""
     
     if not Config.MAIL_USERNAME or not Config.MAIL_PASSWORD:
         raise Exception("Email configuration not set.")
     
-    msg = MIMEMultipart()
-    msg['From'] = Config.MAIL_DEFAULT_SENDER
-    msg['To'] = to_email
-    msg['Subject'] = subject
-    
-    msg.attach(MIMEText(message, 'plain'))
+    msg = build_notification_message(to_email, subject, message)
     
+    shared = server is None
     try:
-        server = smtplib.SMTP_SSL(Config.MAIL_SERVER, Config.MAIL_PORT)
-        server.login(Config.MAIL_USERNAME, Config.MAIL_PASSWORD)
-        text = msg.as_string()
-        server.sendmail(Config.MAIL_DEFAULT_SENDER, to_email, text)
-        server.quit()
+        if shared:
+            server = get_smtp()
+            _smtp_local.sent += 1
+        server.send_message(msg)
         return True
     except Exception as e:
+        if shared and not isinstance(e, smtplib.SMTPRecipientsRefused):
+            close_smtp()  # The connection may be unusable now
         raise Exception(f"Failed to send email: {str(e)}")
 
+# Bulk sends are split across this many threads, each with its own SMTP
+# connection, so their round trips overlap
+SMTP_BULK_WORKERS = 4
+
+def send_batch(messages):
+    """Send (to_email, subject, message) tuples one after another and return how many went out"""
+    sent = 0
+    for to_email, subject, message in messages:
+        try:
+            send_notification_email(to_email, subject, message)
+            sent += 1
+        except Exception as e:
+            print(f"Email to {to_email} failed: {e}")
+    return sent
+
+def send_batch_and_close(messages):
+    """Send a batch on a pool thread, then close that thread's connection"""
+    try:
+        return send_batch(messages)
+    finally:
+        close_smtp()
+
+def send_bulk(messages, workers=SMTP_BULK_WORKERS):
+    """Send (to_email, subject, message) tuples over up to workers SMTP connections.
+
+    Returns the number of messages sent; failures are printed and skipped.
+    """
+    messages = list(messages)
+    workers = min(workers, len(messages))
+    if workers <= 1:
+        return send_batch(messages)  # Reuses this thread's connection
+    
+    batches = [messages[i::workers] for i in range(workers)]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='smtp-bulk') as pool:
+        return sum(pool.map(send_batch_and_close, batches))
+
+_SIZE_NAMES = ("B", "KB", "MB", "GB")
+
 def format_file_size(size_bytes):
     """Format file size in human readable format"""
-    if size_bytes == 0:
+    if size_bytes <= 0:
         return "0B"
-    size_names = ["B", "KB", "MB", "GB"]
-    #import math
-    i = int(math.floor(math.log(size_bytes, 1024)))
-    p = math.pow(1024, i)
-    s = round(size_bytes / p, 2)
-    return f"{s} {size_names[i]}"
+    # Each unit is 2**10 of the last, so the bit length picks the unit
+    i = min((size_bytes.bit_length() - 1) // 10, len(_SIZE_NAMES) - 1)
+    s = round(size_bytes / (1 << (10 * i)), 2)
+    return f"{s} {_SIZE_NAMES[i]}"
+
+@dataclass(slots=True)
+class FileInfo:
+    """Size and modification time of a file; the readable size is only
+    formatted when asked for"""
+    size: int
+    modified: float
+    
+    @property
+    def size_formatted(self):
+        return format_file_size(self.size)
+    
+    def __getitem__(self, key):
+        # Callers written against the old dict, e.g. info['size'], keep working
+        return getattr(self, key)
 
 def get_file_info(filepath):
     """Get file information including size and modification date"""
     try:
         stat = os.stat(filepath)
-        return {
-            'size': stat.st_size,
-            'size_formatted': format_file_size(stat.st_size),
-            'modified': stat.st_mtime
-        }
+        return FileInfo(stat.st_size, stat.st_mtime)
+    except OSError:
+        return None
+
+def get_file_size(filepath):
+    """Get a file's size in bytes, or None if it can't be read"""
+    try:
+        return os.stat(filepath).st_size
     except OSError:
         return None
 
+def get_file_mtime(filepath):
+    """Get a file's modification time, or None if it can't be read"""
+    try:
+        return os.stat(filepath).st_mtime
+    except OSError:
+        return None
+
+# Validation patterns, compiled once at import
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+_USERNAME_RE = re.compile(r'^[a-zA-Z0-9_]{3,20}$')
+_MULTI_UNDERSCORE_RE = re.compile(r'_+')
+
+class _FilenameCharTable(dict):
+    """str.translate table that keeps word characters, '-' and '.' and maps
+    the rest to '_'. Each character is classified the first time it is seen.
+    """
+    
+    MAX_SIZE = 4096  # Stop remembering new characters past this many
+    
+    def __missing__(self, codepoint):
+        char = chr(codepoint)
+        # Same set as the regex class [\w\-_\.]
+        value = codepoint if char.isalnum() or char in '-_.' else '_'
+        if len(self) < self.MAX_SIZE:
+            self[codepoint] = value
+        return value
+
+_FILENAME_CHARS = _FilenameCharTable()
+''.join(map(chr, range(256))).translate(_FILENAME_CHARS)  # Classify Latin-1 up front
+
 def validate_email(email):
     """Simple email validation"""
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
+    return _EMAIL_RE.match(email) is not None
 
 def validate_username(username):
     """Validate username format"""
     # Username should be 3-20 characters, alphanumeric and underscores only
-    pattern = r'^[a-zA-Z0-9_]{3,20}$'
-    return re.match(pattern, username) is not None
+    return _USERNAME_RE.match(username) is not None
 
 def sanitize_filename(filename):
     """Sanitize filename for safe storage"""
     # Remove any path components
     filename = os.path.basename(filename)
-    # Replace spaces and special characters
-    filename = re.sub(r'[^\w\-_\.]', '_', filename)
+    # Replace spaces and special characters, one table lookup per character
+    filename = filename.translate(_FILENAME_CHARS)
     # Remove multiple underscores
-    filename = re.sub(r'_+', '_', filename)
+    filename = _MULTI_UNDERSCORE_RE.sub('_', filename)
     return filename
 
 def create_thumbnail(image_path, thumbnail_path, size=(300, 300)):
@@ -180,7 +331,19 @@ def create_thumbnail(image_path, thumbnail_path, size=(300, 300)):
     try:
         #from PIL import Image
         with Image.open(image_path) as img:
-            img.thumbnail(size, Image.Resampling.LANCZOS)
+            if img.format == 'JPEG':
+                # Let libjpeg decode at 1/2, 1/4 or 1/8 scale, as small as it
+                # can while staying at least the thumbnail size
+                img.draft('RGB', size)
+            
+            # Box-average very large images down with reduce() first, keeping
+            # at least 4x the thumbnail size for the filter pass to work from.
+            # Palette and 1-bit images are resized with NEAREST anyway.
+            factor = min(img.size) // (max(size) * 4)
+            if factor > 1 and img.mode not in ('P', '1'):
+                img = img.reduce(factor)
+            
+            img.thumbnail(size, Image.Resampling.LANCZOS, reducing_gap=None)
             img.save(thumbnail_path, optimize=True, quality=85)
         return True
     except ImportError:
@@ -190,92 +353,342 @@ def create_thumbnail(image_path, thumbnail_path, size=(300, 300)):
         print(f"Thumbnail creation failed: {e}")
         return False
 
+# One SQL string for every call, so the pooled connection's statement cache
+# hands back the already-prepared statement instead of parsing it again
+_LOG_SQL = '''
+            INSERT INTO activity_log (user_id, action, description, created_at) 
+            VALUES (?, ?, ?, ?)
+        '''
+
+# Activity entries go onto a bounded queue and a background thread writes
+# them in batches: one transaction per LOG_BATCH_SIZE entries, or for
+# whatever arrived within LOG_FLUSH_INTERVAL seconds of the first one
+LOG_QUEUE_SIZE = 10000
+LOG_BATCH_SIZE = 1000
+LOG_FLUSH_INTERVAL = 0.5
+
+_log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+_LOG_STOP = object()  # Queued at shutdown to tell the writer to finish
+
+# Started on first use, so a server that imports the app before forking
+# doesn't start the thread in its master process
+_log_flusher = None
+_log_flusher_lock = threading.Lock()
+
+def sqlite_timestamp():
+    """Current UTC time in the same format as SQLite's CURRENT_TIMESTAMP"""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+# When Config.ACTIVITY_LOG_SOCKET is set, entries are sent as JSON datagrams
+# to scripts/activity_logd.py, which batches them into the database in its
+# own process. If the daemon isn't reachable, entries go to the in-process
+# writer instead and the socket is retried after LOG_SOCKET_RETRY seconds.
+LOG_SOCKET_RETRY = 30
+LOG_DATAGRAM_SIZE = 65536  # Larger entries are written in-process instead
+
+_log_socket = None
+_log_socket_retry_at = 0
+_log_socket_lock = threading.Lock()
+
+def send_to_log_daemon(entry):
+    """Send an activity entry to the logging daemon; return False if it can't take it"""
+    global _log_socket, _log_socket_retry_at
+    sock = _log_socket
+    if sock is None:
+        with _log_socket_lock:
+            if _log_socket is None:
+                if time.monotonic() < _log_socket_retry_at:
+                    return False
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+                sock.setblocking(False)  # A full daemon queue falls back, never blocks
+                try:
+                    sock.connect(Config.ACTIVITY_LOG_SOCKET)
+                except OSError:
+                    sock.close()
+                    _log_socket_retry_at = time.monotonic() + LOG_SOCKET_RETRY
+                    return False
+                _log_socket = sock
+            sock = _log_socket
+    
+    datagram = json.dumps(entry).encode()
+    if len(datagram) > LOG_DATAGRAM_SIZE:
+        return False  # The daemon would only get part of it
+    
+    try:
+        sock.send(datagram)
+        return True
+    except BlockingIOError:
+        return False  # Daemon is behind; keep the socket
+    except OSError:
+        with _log_socket_lock:
+            if _log_socket is sock:
+                sock.close()
+                _log_socket = None
+                _log_socket_retry_at = time.monotonic() + LOG_SOCKET_RETRY
+        return False
+
 def log_activity(user_id, action, description=None):
     """Log user activity (requires activity_log table)"""
+    # Stamped now rather than at flush time, so queueing doesn't skew the log
+    entry = (user_id, action, description, sqlite_timestamp())
+    if Config.ACTIVITY_LOG_SOCKET and send_to_log_daemon(entry):
+        return
     
+    start_log_flusher()
+    try:
+        _log_queue.put_nowait(entry)
+    except queue.Full:
+        print(f"Activity log queue full, dropped '{action}' for user {user_id}")
+
+def start_log_flusher():
+    """Start the background activity log writer if it isn't running"""
+    global _log_flusher
+    with _log_flusher_lock:
+        if _log_flusher is None or not _log_flusher.is_alive():
+            _log_flusher = threading.Thread(target=activity_log_flusher,
+                                            name='activity-log', daemon=True)
+            _log_flusher.start()
+
+def collect_activity_batch():
+    """Wait for a queued entry, then gather more until the batch is full or time is up"""
+    batch = [_log_queue.get()]
+    deadline = time.monotonic() + LOG_FLUSH_INTERVAL
+    while len(batch) < LOG_BATCH_SIZE and batch[-1] is not _LOG_STOP:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(_log_queue.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return batch
+
+def activity_log_flusher():
+    """Write queued activity entries in the background, off the request path"""
+    while True:
+        batch = collect_activity_batch()
+        stopping = batch[-1] is _LOG_STOP
+        if stopping:
+            batch.pop()
+        if batch:
+            try:
+                write_activity_batch(batch)
+            except Exception as e:
+                print(f"Activity log writer error: {e}")
+        if stopping:
+            return
+
+def write_activity_batch(batch):
+    """Write a batch of activity entries in a single transaction"""
     conn = get_db_connection()
     try:
-        conn.execute('''
-            INSERT INTO activity_log (user_id, action, description, created_at) 
-            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-        ''', (user_id, action, description))
-        conn.commit()
+        # Join the caller's transaction if one is open, otherwise commit the
+        # whole batch at once rather than once per row
+        own_transaction = not conn.in_transaction
+        if own_transaction:
+            conn.execute('BEGIN IMMEDIATE')
+        conn.executemany(_LOG_SQL, batch)
+        if own_transaction:
+            conn.commit()
     except Exception as e:
         print(f"Activity logging failed: {e}")
     finally:
         conn.close()
 
+def flush_activity_log():
+    """Write every queued activity entry now"""
+    while True:
+        batch = []
+        while len(batch) < LOG_BATCH_SIZE:
+            try:
+                entry = _log_queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is not _LOG_STOP:
+                batch.append(entry)
+        if not batch:
+            return
+        write_activity_batch(batch)
+
+def stop_log_flusher(timeout=5):
+    """Let the background writer finish its batch, then write whatever is left"""
+    flusher = _log_flusher
+    if flusher is not None and flusher.is_alive():
+        try:
+            _log_queue.put(_LOG_STOP, timeout=timeout)
+            flusher.join(timeout)
+        except queue.Full:
+            pass
+    flush_activity_log()
+
+atexit.register(stop_log_flusher)
+
 def get_referenced_images():
     """Get all image references from database"""
     
     conn = get_db_connection()
     try:
-        referenced_images = set()
-        articles = conn.execute('SELECT image_path FROM articles WHERE image_path IS NOT NULL').fetchall()
-        for article in articles:
-            if article['image_path']:
-                referenced_images.add(article['image_path'])
-        return referenced_images
+        # Empty paths are filtered in SQL, so every row is a real reference
+        rows = conn.execute("SELECT image_path FROM articles WHERE image_path IS NOT NULL AND image_path != ''").fetchall()
+        return {row[0] for row in rows}
     finally:
         conn.close()
 
 def get_upload_files():
     """Get all files in upload directory"""
     
-    upload_files = set()
-    upload_dir = Config.UPLOAD_FOLDER
+    # Compare whole suffixes ('.jpg') so each name needs only one splitext
+    suffixes = frozenset('.' + ext.lower() for ext in Config.ALLOWED_EXTENSIONS)
     
-    for ext in Config.ALLOWED_EXTENSIONS:
-        pattern = os.path.join(upload_dir, f"*.{ext}")
-        files = glob.glob(pattern)
-        for file_path in files:
-            filename = os.path.basename(file_path)
-            upload_files.add(filename)
-    
-    return upload_files
+    # One directory listing; DirEntry.is_file() uses the type readdir returned
+    try:
+        with os.scandir(Config.UPLOAD_FOLDER) as entries:
+            return {entry.name for entry in entries
+                    if entry.is_file() and os.path.splitext(entry.name)[1].lower() in suffixes}
+    except FileNotFoundError:
+        return set()
+
+# Unlinks are independent and mostly wait on the filesystem, so several run
+# at once; this matters most on network storage
+REMOVE_WORKERS = 8
+
+def try_unlink(path):
+    """Remove a file and return None, or the OSError that stopped it"""
+    try:
+        os.unlink(path)
+    except OSError as e:
+        return e
+    return None
 
 def remove_orphaned_files(orphaned_files):
     """Remove the orphaned files and return count of removed files"""
     removed_count = 0
+    failed = []
     upload_dir = Config.UPLOAD_FOLDER
+    orphaned_files = list(orphaned_files)
+    if not orphaned_files:
+        return 0
     
-    for filename in orphaned_files:
-        file_path = os.path.join(upload_dir, filename)
-        try:
-            os.remove(file_path)
+    paths = [os.path.join(upload_dir, filename) for filename in orphaned_files]
+    with ThreadPoolExecutor(max_workers=min(REMOVE_WORKERS, len(paths)),
+                            thread_name_prefix='orphan-remove') as pool:
+        errors = list(pool.map(try_unlink, paths))
+    
+    for filename, error in zip(orphaned_files, errors):
+        if error is None:
             removed_count += 1
-            print(f"Removed orphaned file: {filename}")
-        except OSError as e:
-            print(f"Failed to remove {filename}: {e}")
+        elif isinstance(error, FileNotFoundError):
+            pass  # Already gone, nothing to do
+        else:
+            failed.append(f"{filename} ({error})")
+    
+    # One summary instead of a line per file
+    if removed_count:
+        invalidate_storage_usage()
+        print(f"Removed {removed_count} orphaned files")
+    if failed:
+        print(f"Failed to remove {len(failed)} orphaned files: {', '.join(failed)}")
     
     return removed_count
 
+def find_orphaned_files(upload_files):
+    """Get the upload files that no article references.
+
+    The file names go into a temporary table so SQLite does the set
+    difference, instead of every image_path being loaded into Python.
+    """
+    if not upload_files:
+        return set()
+    
+    conn = get_read_connection()
+    try:
+        conn.execute('CREATE TEMP TABLE fs_files (name TEXT PRIMARY KEY)')
+        conn.executemany('INSERT OR IGNORE INTO fs_files (name) VALUES (?)', ((name,) for name in upload_files))
+        # One index probe per file name, so the cost follows the number of
+        # files rather than the number of articles
+        rows = conn.execute('''
+            SELECT name FROM fs_files
+            WHERE NOT EXISTS (SELECT 1 FROM articles WHERE image_path = fs_files.name)
+        ''').fetchall()
+        return {row[0] for row in rows}
+    finally:
+        conn.execute('DROP TABLE IF EXISTS temp.fs_files')
+        conn.close()
+
 def cleanup_orphaned_images():
     """Remove image files that are no longer referenced in the database"""
-    referenced_images = get_referenced_images()
     upload_files = get_upload_files()
     
     # Find orphaned files
-    orphaned_files = upload_files - referenced_images
+    orphaned_files = find_orphaned_files(upload_files)
     
     return remove_orphaned_files(orphaned_files)
 
-def get_storage_usage():
-    """Get storage usage statistics"""
-    upload_dir = Config.UPLOAD_FOLDER
+# Storage totals are kept between full scans of the upload folder and
+# adjusted as files come and go; a full rescan happens at least this often
+STORAGE_USAGE_TTL = 300  # seconds
+
+_storage_usage = None  # (total_size, file_count)
+_storage_usage_time = 0
+_storage_usage_lock = threading.Lock()
+
+# Subfolders of the upload folder are read in parallel, since each listing
+# mostly waits on the filesystem. Four suits most local disks; raise it for
+# network filesystems with high per-call latency.
+STORAGE_SCAN_WORKERS = 4
+
+def scan_directory(path):
+    """Return (total_size, file_count, subfolders) for the files directly in path.
+
+    Sizes come from DirEntry.stat(), which the scandir entry caches, so each
+    file costs one stat call instead of os.walk's listing plus a getsize.
+    """
     total_size = 0
     file_count = 0
-    
-    if os.path.exists(upload_dir):
-        for root, dirs, files in os.walk(upload_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
+    subfolders = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
                 try:
-                    file_size = os.path.getsize(file_path)
-                    total_size += file_size
-                    file_count += 1
+                    if entry.is_file(follow_symlinks=False):
+                        total_size += entry.stat(follow_symlinks=False).st_size
+                        file_count += 1
+                    elif entry.is_dir(follow_symlinks=False):
+                        subfolders.append(entry.path)
                 except OSError:
                     continue
+    except OSError:
+        pass  # Missing or unreadable folder
+    
+    return total_size, file_count, subfolders
+
+def scan_storage_usage():
+    """Walk the upload folder and return (total_size, file_count)"""
+    total_size, file_count, subfolders = scan_directory(Config.UPLOAD_FOLDER)
+    if not subfolders:
+        return total_size, file_count  # Flat folder, no pool needed
+    
+    with ThreadPoolExecutor(max_workers=STORAGE_SCAN_WORKERS,
+                            thread_name_prefix='storage-scan') as pool:
+        pending = {pool.submit(scan_directory, path) for path in subfolders}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                size, count, subfolders = future.result()
+                total_size += size
+                file_count += count
+                pending.update(pool.submit(scan_directory, path) for path in subfolders)
+    
+    return total_size, file_count
+
+def get_storage_usage():
+    """Get storage usage statistics"""
+    global _storage_usage, _storage_usage_time
+    with _storage_usage_lock:
+        if _storage_usage is None or time.monotonic() - _storage_usage_time >= STORAGE_USAGE_TTL:
+            _storage_usage = scan_storage_usage()
+            _storage_usage_time = time.monotonic()
+        total_size, file_count = _storage_usage
     
     return {
         'total_size': total_size,
@@ -283,23 +696,84 @@ def get_storage_usage():
         'file_count': file_count
     }
 
+def update_storage_usage(size_delta, count_delta=1):
+    """Adjust the cached storage totals after a file is added or removed"""
+    global _storage_usage
+    with _storage_usage_lock:
+        if _storage_usage is not None:
+            total_size, file_count = _storage_usage
+            _storage_usage = (total_size + size_delta, file_count + count_delta)
+
+def invalidate_storage_usage():
+    """Drop the cached storage totals so the next read rescans"""
+    global _storage_usage
+    with _storage_usage_lock:
+        _storage_usage = None
+
+# One compiled pattern: each lookahead skips straight past the characters it
+# doesn't want (no backtracking), then the length is checked in the same match
+_SPECIAL_CHARS = re.escape('!@#$%^&*(),.?":{}|<>')
+_STRONG_PASSWORD_RE = re.compile(
+    r'(?=[^A-Z]*[A-Z])'
+    r'(?=[^a-z]*[a-z])'
+    r'(?=[^0-9]*[0-9])'
+    rf'(?=[^{_SPECIAL_CHARS}]*[{_SPECIAL_CHARS}])'
+    r'.{8,20}',
+    re.DOTALL
+)
+
 def is_strong_password(password):
-    if len(password) < 8 or len(password) > 20:
-        return False
-    if not re.search(r'[A-Z]', password):
-        return False
-    if not re.search(r'[a-z]', password):
-        return False
-    if not re.search(r'\d', password):
-        return False
-    if not re.search(r'[!@#$%^&*(),.?":{}|<>]', password):
-        return False
-    return True
+    """Check length and that upper, lower, digit and special characters all appear"""
+    return _STRONG_PASSWORD_RE.fullmatch(password) is not None
 
 def hash_password(password):
-    """Hash a password with salt using werkzeug (scrypt)."""
-    return generate_password_hash(password, method='scrypt', salt_length=16)
+    """Hash a password with salt using werkzeug (Config.PASSWORD_HASH_METHOD)."""
+    return generate_password_hash(password, method=Config.PASSWORD_HASH_METHOD, salt_length=16)
+
+_hash_method_prefix = None
+
+def get_hash_method_prefix():
+    """Return the method field that current hashes start with, e.g. 'scrypt:32768:8:1$'"""
+    global _hash_method_prefix
+    if _hash_method_prefix is None:
+        # werkzeug fills in the default parameters, so read them off a hash
+        sample = generate_password_hash('', method=Config.PASSWORD_HASH_METHOD, salt_length=1)
+        _hash_method_prefix = sample.split('$', 1)[0] + '$'
+    return _hash_method_prefix
+
+# Created on first use, so a server that imports the app before forking
+# doesn't start these threads in its master process
+_hash_pool = None
+_hash_pool_lock = threading.Lock()
+
+def get_hash_pool():
+    """Return the password hashing thread pool, creating it on first use"""
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is None:
+            _hash_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1,
+                                            thread_name_prefix='password-hash')
+    return _hash_pool
+
+def hash_password_async(password):
+    """Start hashing a password on the hashing pool and return the Future.
+
+    scrypt runs inside OpenSSL with the GIL released, so pooled hashes run in
+    parallel with each other and with the request threads.
+    """
+    return get_hash_pool().submit(hash_password, password)
+
+def is_password_hash(stored_hash):
+    """Check whether a stored password is a werkzeug hash rather than plain text."""
+    return stored_hash.startswith(('scrypt:', 'pbkdf2:'))
+
+def password_needs_rehash(stored_hash):
+    """Check whether a stored password should be re-hashed with the current method."""
+    return not stored_hash.startswith(get_hash_method_prefix())
 
 def verify_password(stored_hash, password):
     """Verify a password against the stored hash."""
+    if not is_password_hash(stored_hash):
+        # Accounts created before passwords were hashed; compare in constant time
+        return hmac.compare_digest(stored_hash.encode(), password.encode())
     return check_password_hash(stored_hash, password)
\ No newline at end of file